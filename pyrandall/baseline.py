@@ -0,0 +1,108 @@
+import json
+import os
+from typing import NamedTuple
+
+# metrics compared to the baseline, True when a higher value is better
+COMPARED = {
+    "seconds": False,
+    "mean_ms": False,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "max_ms": False,
+    "rate_per_sec": True,
+    "per_sec": True,
+    "achieved_per_sec": True,
+}
+# differences smaller than these are taken as noise
+MIN_DIFFERENCE = {"seconds": 0.005, "ms": 5.0}
+DEFAULT_TOLERANCE = 0.2
+VERSION = 1
+
+
+def collect(scenarios, tasks):
+    """
+    Keys the scenario wall times and task metrics of a Reporter,
+    tasks are keyed by scenario, phase and their description.
+    """
+    out = {}
+    for scenario in scenarios:
+        out[scenario["scenario"]] = {"wall_time": {"seconds": scenario["seconds"]}}
+    for task in tasks:
+        key = f"{task['scenario']} > {task['phase']} > {task['task']}"
+        nr = 2
+        unique = key
+        while unique in out:
+            unique = f"{key} #{nr}"
+            nr += 1
+        out[unique] = task["metrics"]
+    return out
+
+
+def min_difference(metric):
+    if metric.endswith("_ms"):
+        return MIN_DIFFERENCE["ms"]
+    if metric == "seconds":
+        return MIN_DIFFERENCE["seconds"]
+    return 0.0
+
+
+class Regression(NamedTuple):
+    key: str
+    label: str
+    metric: str
+    baseline: float
+    actual: float
+
+    def __str__(self):
+        return f"{self.key}: {self.label} {self.metric} was {self.baseline}, now {self.actual}"
+
+
+class Baseline:
+    """
+    Timings of a run saved to a json file, to compare later runs
+    against. A metric regressed when it is worse than the baseline
+    by more than `tolerance` (a fraction of the baseline value).
+    """
+
+    def __init__(self, save_path=None, compare_path=None, tolerance=DEFAULT_TOLERANCE):
+        self.save_path = save_path
+        self.compare_path = compare_path
+        self.tolerance = tolerance
+
+    def load(self):
+        if not os.path.exists(self.compare_path):
+            return None
+        with open(self.compare_path) as f:
+            data = json.load(f)
+        if data.get("version") != VERSION:
+            raise ValueError(f"baseline {self.compare_path} has an unsupported version")
+        return data["timings"]
+
+    def save(self, current):
+        with open(self.save_path, "w") as f:
+            json.dump(
+                {"version": VERSION, "timings": current}, f, indent=2, sort_keys=True
+            )
+
+    def compare(self, baseline, current):
+        regressions = []
+        for key, labels in current.items():
+            for label, values in labels.items():
+                before = baseline.get(key, {}).get(label, {})
+                for metric, higher_is_better in COMPARED.items():
+                    actual, expected = values.get(metric), before.get(metric)
+                    if actual is None or expected is None:
+                        continue
+                    if self.regressed(metric, expected, actual, higher_is_better):
+                        regressions.append(
+                            Regression(key, label, metric, expected, actual)
+                        )
+        return regressions
+
+    def regressed(self, metric, expected, actual, higher_is_better):
+        if abs(actual - expected) <= min_difference(metric):
+            return False
+        if higher_is_better:
+            return actual < expected * (1 - self.tolerance)
+        return actual > expected * (1 + self.tolerance)
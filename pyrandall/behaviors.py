@@ -15,7 +15,7 @@ def pyrandall_cli_banner(config):
 @pyrandall.hookimpl
 def pyrandall_parse_http_request_template(filename, data):
     if filename.find(".json") > 0:
-        body = json.dumps(json.loads(data))
+        body = json.dumps(json.loads(data)).encode()
         headers = {"content-type": "application/json"}
     else:
         body = data.encode()
@@ -0,0 +1,26 @@
+import os
+
+
+class FileCache:
+    """
+    Values derived from files, kept for the duration of a run.
+    Entries are keyed by path and mtime, an edited file is read again.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, build, *key):
+        """
+        return the cached value for path (and the extra key parts),
+        build() is called to create it on a miss
+        """
+        entry_key = (os.path.abspath(path), os.stat(path).st_mtime_ns) + key
+        if entry_key in self.entries:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.entries[entry_key] = build()
+        return self.entries[entry_key]
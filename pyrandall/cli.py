@@ -9,6 +9,7 @@ import jsonschema
 
 from pyrandall import const
 from pyrandall import commander
+from pyrandall.baseline import DEFAULT_TOLERANCE, Baseline
 from pyrandall.hookspecs import get_plugin_manager
 from pyrandall.spec import SpecBuilder
 from pyrandall.types import Flags
@@ -21,9 +22,28 @@ from pyrandall.types import Flags
 @click.option("-V", "--only-validate", 'command_flag', flag_value=Flags.VALIDATE, help="filters the spec and runs simulate steps")
 @click.option("-e", "--everything", 'command_flag', flag_value=Flags.E2E, default=True, help="(default) run simulate, then validate synchronously")
 @click.option("-d", "--dry-run", 'filter_flag', flag_value=Flags.DESCRIBE)
+@click.option(
+    "--baseline",
+    "baseline_file",
+    type=click.Path(dir_okay=False),
+    help="save task timings of this run to a json file.",
+)
+@click.option(
+    "--compare-baseline",
+    "compare_file",
+    type=click.Path(dir_okay=False),
+    help="fail when tasks got slower than the timings in this json file.",
+)
+@click.option(
+    "--tolerance",
+    type=float,
+    default=DEFAULT_TOLERANCE,
+    show_default=True,
+    help="fraction a timing may be worse than the baseline.",
+)
 @click.help_option()
 @click.version_option(version=const.get_version())
-def main(config_file, command_flag, filter_flag, specfiles):
+def main(config_file, command_flag, filter_flag, baseline_file, compare_file, tolerance, specfiles):
     """
     pyrandall a test framework oriented around data validation instead of code
 
@@ -50,15 +70,18 @@ def main(config_file, command_flag, filter_flag, specfiles):
         filter_flag = Flags.NOOP
 
     flags = command_flag | filter_flag
+    baseline = None
+    if baseline_file or compare_file:
+        baseline = Baseline(baseline_file, compare_file, tolerance)
     try:
-        run_command(config, flags, specfile)
+        run_command(config, flags, specfile, baseline)
     except jsonschema.exceptions.ValidationError as e:
         click.echo(f"Error on validating specfile {specfile} with jsonschema, given error:", err=True)
         click.echo(e, err=True)
         exit(4)
 
 
-def run_command(config, flags, specfile):
+def run_command(config, flags, specfile, baseline=None):
     # TODO: add logging options
     # with open("logging.yaml") as log_conf_file:
     #     log_conf = yaml.safe_load(log_conf_file)
@@ -75,7 +98,9 @@ def run_command(config, flags, specfile):
 
     spec = SpecBuilder(hook=plugin_manager.hook, **config).feature()
     # commander handles execution flow with specified data and config
-    commander.Commander(spec, flags).invoke()
+    commander.Commander(
+        spec, flags, baseline=baseline, requests_config=config["requests"]
+    ).invoke()
 
 
 def build_basedir(specfile):
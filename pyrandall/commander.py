@@ -1,13 +1,50 @@
-from . import executors
+import time
+
+from . import baseline, executors, network
+from .correlation import Correlations
+from .executors.requests_http import OPEN_MODEL_IN_FLIGHT
+from .kafka import ConsumerRegistry, ProducerPool
 from .reporter import Reporter
 from .spec import Adapter
 from .types import Flags
 
 
 class Commander:
-    def __init__(self, spec, flags: Flags):
+    def __init__(self, spec, flags: Flags, baseline=None, requests_config=None):
         self.spec = spec
         self.flags = flags
+        # optional pyrandall.baseline.Baseline to save and compare timings
+        self.baseline = baseline
+        # http connections are pooled and kept alive for the whole run
+        self.requests_config = requests_config or {}
+        self.session = network.create_session(
+            self.requests_config, in_flight=self.max_in_flight()
+        )
+        # "engine": "asyncio" sends http requests from one event loop
+        self.async_engine = None
+        if self.requests_config.get("engine") == "asyncio":
+            self.async_engine = executors.AsyncEngine(self.requests_config)
+        # kafka producers are shared by all scenarios of a run
+        self.producers = ProducerPool()
+        # offsets can only be taken at simulate start when simulating
+        self.consumers = ConsumerRegistry(
+            snapshot_offsets=flags.has_simulate(), producers=self.producers
+        )
+        # ids stamped while simulating, looked up when validating
+        self.correlations = Correlations()
+
+    def max_in_flight(self):
+        # concurrent requests of the busiest http task in the spec
+        default = self.requests_config.get("max_in_flight")
+        out = default or 1
+        for scenario in self.spec.scenario_items:
+            for task in scenario.simulate_tasks:
+                if task.adapter != Adapter.REQUEST_HTTP_EVENTS:
+                    continue
+                # see RequestHttpEvents.execute_open_model
+                fallback = OPEN_MODEL_IN_FLIGHT if task.rate_per_sec else 1
+                out = max(out, task.max_in_flight or default or fallback)
+        return out
 
     def invoke(self):
         success = self.run(Reporter())
@@ -22,9 +59,34 @@ class Commander:
         # - only validate
         # - consecutively simulate and validate
         reporter.feature(self.spec.description)
-        self.run_scenarios(self.spec.scenario_items, reporter)
+        try:
+            self.run_scenarios(self.spec.scenario_items, reporter)
+        finally:
+            self.producers.close()
+            self.consumers.close()
+            self.session.close()
+            if self.async_engine:
+                self.async_engine.close()
+        reporter.producer_pool(self.producers.stats())
         reporter.print_failures()
-        return reporter.passed()
+        regressions = self.check_baseline(reporter)
+        return reporter.passed() and not regressions
+
+    def check_baseline(self, reporter):
+        if self.baseline is None:
+            return []
+        current = baseline.collect(reporter.scenarios, reporter.tasks)
+        regressions = []
+        if self.baseline.compare_path:
+            previous = self.baseline.load()
+            if previous is None:
+                reporter.baseline_missing(self.baseline.compare_path)
+            else:
+                regressions = self.baseline.compare(previous, current)
+                reporter.print_regressions(regressions, self.baseline.tolerance)
+        if self.baseline.save_path:
+            self.baseline.save(current)
+        return regressions
 
     def run_scenarios(self, scenario_items, reporter):
         for scenario in scenario_items:
@@ -36,6 +98,15 @@ class Commander:
             # 1. success/failure per test and overall
             # 2. call output interface
             reporter.scenario(scenario.description)
+            scenario_start = time.monotonic()
+
+            validators = []
+            if self.flags.has_validate():
+                # validators are created up front, so kafka consumers
+                # get their partitions assigned while simulating
+                validators = [self.executor_factory(s) for s in scenario.validate_tasks]
+                for e in validators:
+                    e.prepare()
 
             if self.flags.has_simulate():
                 reporter.simulate()
@@ -43,24 +114,54 @@ class Commander:
                 for spec in scenario.simulate_tasks:
                     e = self.executor_factory(spec)
                     reporter.run_task(e.represent())
+                    start = time.monotonic()
                     e.execute(resultset)
+                    # task boundary, nothing may be left in flight
+                    self.producers.flush()
+                    reporter.task_time(time.monotonic() - start)
 
             if self.flags.has_validate():
                 reporter.validate()
                 resultset = reporter.create_and_track_resultset()
-                for spec in scenario.validate_tasks:
-                    e = self.executor_factory(spec)
+                for e in validators:
                     reporter.run_task(e.represent())
+                    start = time.monotonic()
                     e.execute(resultset)
+                    reporter.task_time(time.monotonic() - start)
+
+            reporter.scenario_time(time.monotonic() - scenario_start)
 
     def executor_factory(self, spec):
         # each spec can be run with an executor
         # based on the adapter defined on the spec
-        if spec.adapter == Adapter.REQUESTS_HTTP:
-            return executors.RequestHttp(spec)
+        if self.async_engine and spec.adapter == Adapter.REQUESTS_HTTP:
+            return executors.AsyncRequestHttp(
+                spec, engine=self.async_engine, correlations=self.correlations
+            )
+        elif self.async_engine and spec.adapter == Adapter.REQUEST_HTTP_EVENTS:
+            return executors.AsyncRequestHttpEvents(
+                spec,
+                engine=self.async_engine,
+                correlations=self.correlations,
+                max_in_flight=self.requests_config.get("max_in_flight"),
+            )
+        elif spec.adapter == Adapter.REQUESTS_HTTP:
+            return executors.RequestHttp(
+                spec, session=self.session, correlations=self.correlations
+            )
         elif spec.adapter == Adapter.REQUEST_HTTP_EVENTS:
-            return executors.RequestHttpEvents(spec)
+            return executors.RequestHttpEvents(
+                spec,
+                session=self.session,
+                correlations=self.correlations,
+                max_in_flight=self.requests_config.get("max_in_flight"),
+            )
         elif spec.adapter == Adapter.BROKER_KAFKA:
-            return executors.BrokerKafka(spec)
+            return executors.BrokerKafka(
+                spec,
+                producers=self.producers,
+                consumers=self.consumers,
+                correlations=self.correlations,
+            )
         else:
             raise NotImplementedError("no such adapter implemented")
@@ -0,0 +1,40 @@
+import time
+import uuid
+
+HEADER_CORRELATION_ID = "pyrandall-correlation-id"
+HEADER_SENT_AT = "pyrandall-sent-at"
+
+
+class Correlations:
+    """
+    Correlation ids stamped on simulated events, with the time they were
+    sent. Validate looks up the id in the headers of a consumed event
+    to measure the end-to-end latency of the pipeline under test.
+    """
+
+    def __init__(self):
+        self.sent = {}
+
+    def stamp(self, headers=None):
+        correlation_id = uuid.uuid4().hex
+        sent_at = time.time()
+        self.sent[correlation_id] = sent_at
+        out = dict(headers or {})
+        out[HEADER_CORRELATION_ID] = correlation_id
+        # epoch milliseconds, like kafka timestamps
+        out[HEADER_SENT_AT] = str(int(sent_at * 1000))
+        return out
+
+    def latency(self, headers, received_at):
+        """
+        Seconds between sending and `received_at` (epoch seconds), None
+        when the event carries no correlation id stamped in this run.
+        """
+        correlation_id = (headers or {}).get(HEADER_CORRELATION_ID)
+        if isinstance(correlation_id, bytes):
+            correlation_id = correlation_id.decode("utf-8", errors="replace")
+        sent_at = self.sent.get(correlation_id)
+        if sent_at is None:
+            return None
+        # clocks of the broker and this host may differ slightly
+        return max(received_at - sent_at, 0.0)
@@ -1,5 +1,14 @@
 from .broker_kafka import BrokerKafka
 from .common import Executor
 from .requests_http import RequestHttp, RequestHttpEvents
+from .requests_http_async import AsyncEngine, AsyncRequestHttp, AsyncRequestHttpEvents
 
-__all__ = ["BrokerKafka", "Executor", "RequestHttp", "RequestHttpEvents"]
+__all__ = [
+    "AsyncEngine",
+    "AsyncRequestHttp",
+    "AsyncRequestHttpEvents",
+    "BrokerKafka",
+    "Executor",
+    "RequestHttp",
+    "RequestHttpEvents",
+]
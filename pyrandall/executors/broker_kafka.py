@@ -1,13 +1,37 @@
-from pyrandall.kafka import KafkaConn
-from pyrandall.types import Assertion, ExecutionMode, UnorderedDiffAssertion
+from pyrandall.kafka import ConsumeListener, KafkaConn
+from pyrandall.matchers import ReceivedEvents
+from pyrandall.types import (
+    Assertion,
+    ExecutionMode,
+    MatcherAssertion,
+    UnorderedDiffAssertion,
+)
 from .common import Executor
 
 
 class BrokerKafka(Executor):
-    def __init__(self, spec, *args, **kwargs):
+    def __init__(
+        self, spec, *args, producers=None, consumers=None, correlations=None, **kwargs
+    ):
         super().__init__()
         self.execution_mode = spec.execution_mode
         self.spec = spec
+        self.producers = producers
+        self.consumers = consumers
+        self.correlations = correlations
+        self.received = None
+        self.listener = None
+        self.shared = None
+
+    def prepare(self):
+        if self.execution_mode is ExecutionMode.VALIDATING and self.consumers:
+            self.received = ReceivedEvents(self.spec.assertions, self.correlations)
+            self.listener = ConsumeListener(
+                on_event=self.received.receive, **self.consume_options(self.received)
+            )
+            self.shared = self.consumers.subscribe_ahead(
+                self.spec.topic, self.listener, self.spec.consume_from
+            )
 
     def execute(self, reporter):
         if self.execution_mode is ExecutionMode.SIMULATING:
@@ -16,33 +40,88 @@ class BrokerKafka(Executor):
             self.validate(self.spec, reporter)
 
     def simulate(self, spec, reporter):
-        kafka = KafkaConn()
+        kafka = KafkaConn(producers=self.producers)
         kafka.init_producer()
+        stamp = None
+        if spec.stamp_correlation_id and self.correlations:
+            stamp = self.correlations.stamp
 
         with Assertion(
             "events_produced", spec.assertions, "produced a event", reporter
         ) as a:
-            send = 0
-            for event in spec.events:
-                kafka.produce_message(spec.topic, event)
-                send += 1
-            a.actual_value = send
+            report = kafka.produce_messages(
+                spec.topic,
+                spec.events,
+                total=spec.produce_total,
+                rate_per_sec=spec.rate_per_sec,
+                stamp=stamp,
+            )
+            a.actual_value = report.delivered
+        metrics = report.metrics()
+        if spec.rate_per_sec:
+            achieved = metrics["rate_per_sec"] or 0.0
+            metrics["target_per_sec"] = spec.rate_per_sec
+            metrics["shortfall_per_sec"] = round(
+                max(spec.rate_per_sec - achieved, 0.0), 1
+            )
+        reporter.metrics("produce", metrics)
 
     def validate(self, spec, reporter):
-        kafka = KafkaConn()
-        kafka.check_connection()
-        consumed = kafka.consume(spec.topic, spec.assertions.get("timeout_after", 2.0))
+        if self.shared:
+            # reads once for all validate tasks on this topic
+            self.shared.consume()
+            received = self.received
+        else:
+            received = ReceivedEvents(spec.assertions, self.correlations)
+            kafka = KafkaConn(producers=self.producers)
+            kafka.check_connection()
+            for record in kafka.consume(spec.topic, **self.consume_options(received)):
+                received.receive(record)
+
         with Assertion(
             "total_events", spec.assertions, "total amount of received events", reporter
         ) as a:
-            # should not be needed to keep track here
-            # assertions.append(a)
-            a.actual_value = len(consumed)
+            a.actual_value = received.total
 
         with UnorderedDiffAssertion(
             "unordered", spec.assertions, "unordered events", reporter
         ) as a:
-            a.actual_value = consumed
+            a.actual_value = received.matchers.get("unordered")
+
+        if received.latency.timings:
+            reporter.metrics("end_to_end_latency", received.latency.metrics())
+        if received.throughput:
+            reporter.metrics("throughput", received.throughput.metrics())
+
+        matchers = [
+            ("ordered", "ordered events", received.matchers.get("ordered")),
+            (
+                "first_event",
+                "first received event",
+                received.matchers.get("first_event"),
+            ),
+            ("last_event", "last received event", received.matchers.get("last_event")),
+            (
+                "matches_subset",
+                "events matching subsets",
+                received.matchers.get("matches_subset"),
+            ),
+            ("latency_under", "end-to-end latency", received.latency),
+            ("throughput", "throughput of received events", received.throughput),
+        ]
+        for field, fail_text, matcher in matchers:
+            # not reported as skipped when the spec does not use them
+            if field not in spec.assertions:
+                continue
+            with MatcherAssertion(field, spec.assertions, fail_text, reporter) as a:
+                a.actual_value = matcher
+
+    def consume_options(self, received):
+        return {
+            "topic_timeout": self.spec.assertions.get("timeout_after", 2.0),
+            "until": received.satisfied,
+            "grace_period": self.spec.assertions.get("grace_period", 0.0),
+        }
 
     def represent(self):
         return (
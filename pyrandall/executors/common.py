@@ -9,3 +9,7 @@ class Executor(ABC):
     @abstractmethod
     def represent(self):
         ...
+
+    # called for validate tasks before the simulate phase starts
+    def prepare(self):
+        pass
@@ -1,16 +1,42 @@
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
-from pyrandall.types import Assertion
+from pyrandall.network import (
+    HttpTimings,
+    RequestTiming,
+    headers_size,
+    measures_connect,
+    take_connect_time,
+)
+from pyrandall.reporter import BufferedResultSet
+
+from pyrandall.stats import Timings, to_ms
+from pyrandall.types import Assertion, FileBody
 from pyrandall import const
 
 from .common import Executor
 
+# concurrent requests of an open-model load without max_in_flight
+OPEN_MODEL_IN_FLIGHT = 64
+
 
 class RequestHttp(Executor):
-    def __init__(self, spec, *args, **kwargs):
+    def __init__(
+        self, spec, *args, session=None, correlations=None, timings=None, **kwargs
+    ):
         super().__init__()
         self.execution_mode = spec.execution_mode
         self.spec = self.add_custom_headers(spec)
+        # a pooled requests.Session of the run, or a connection per request
+        self.http = session if session is not None else requests
+        # connect time and reuse are only known with a session of create_session
+        self.measure_connect = measures_connect(self.http)
+        self.correlations = correlations
+        # HttpTimings of the task are recorded here when given, else reported
+        self.timings = timings
 
     def execute(self, reporter):
         spec = self.spec
@@ -18,27 +44,107 @@ class RequestHttp(Executor):
             # TODO: Reporter should say "zero assertions found / specified"
             return False
 
+        if spec.poll:
+            return self.execute_polling(reporter)
+        return self.execute_once(reporter)
+
+    def execute_once(self, reporter):
+        spec = self.spec
         # TODO: assert / tests the request happened without exceptions
         # act on __exit__ codes
         # with Assertion("response", spec.assertions, "http response", reporter) as a:
-        if spec.body:
-            response = requests.request(
-                spec.method, spec.url, headers=spec.headers, data=spec.body
+        headers = self.request_headers()
+        take_connect_time()
+        start = time.monotonic()
+        if isinstance(spec.body, FileBody):
+            # streamed from disk, opened again for every attempt
+            with spec.body.open() as body:
+                response = self.http.request(
+                    spec.method, spec.url, headers=headers, data=body
+                )
+        elif spec.body:
+            response = self.http.request(
+                spec.method, spec.url, headers=headers, data=spec.body
             )
         else:
-            response = requests.request(spec.method, spec.url, headers=spec.headers)
+            response = self.http.request(spec.method, spec.url, headers=headers)
+        total = time.monotonic() - start
+
+        self.record_timing(self.timing_of(response, total), reporter)
+        return self.assert_response(response.status_code, response.content, reporter)
+
+    def timing_of(self, response, total):
+        connect = take_connect_time() if self.measure_connect else None
+        request = response.request
+        if isinstance(self.spec.body, FileBody):
+            body_size = self.spec.body.size
+        else:
+            body_size = len(request.body or b"")
+        # request line, headers and body; the status line is left out of the response
+        request_bytes = len(request.method) + len(request.url) + 11
+        request_bytes += headers_size(request.headers) + body_size
+        return RequestTiming(
+            connect=connect,
+            # requests measures until the response headers are parsed
+            ttfb=response.elapsed.total_seconds(),
+            total=total,
+            request_bytes=request_bytes,
+            response_bytes=headers_size(response.headers) + len(response.content),
+            reused=(connect is None) if self.measure_connect else None,
+        )
 
+    # Sends the request again until the assertions pass or the timeout of
+    # the poll policy is up, only the results of the last attempt are reported.
+    def execute_polling(self, reporter):
+        poll = self.spec.poll
+        start = time.monotonic()
+        deadline = start + poll.timeout
+        attempts = 0
+        for delay in poll.delays():
+            attempts += 1
+            buffer = BufferedResultSet()
+            try:
+                passed = self.execute_once(buffer)
+            except requests.RequestException as e:
+                # the service may not be up yet
+                passed = self.assert_response(f"{type(e).__name__} {e}", None, buffer)
+            now = time.monotonic()
+            if passed or now >= deadline:
+                break
+            # the last attempt is made at the deadline
+            time.sleep(min(delay, deadline - now))
+        buffer.replay(reporter)
+        reporter.metrics(
+            "poll",
+            {"attempts": attempts, "seconds": round(time.monotonic() - start, 3)},
+        )
+        return passed
+
+    def request_headers(self):
+        if self.spec.stamp_correlation_id and self.correlations:
+            return self.correlations.stamp(self.spec.headers)
+        return self.spec.headers
+
+    def record_timing(self, timing, reporter):
+        if self.timings is not None:
+            self.timings.record(timing)
+            return
+        timings = HttpTimings()
+        timings.record(timing)
+        report_http_timings(timings, reporter)
+
+    def assert_response(self, status_code, content, reporter):
         assertions = []
         with Assertion(
-            "status_code", spec.assertions, "http response status_code", reporter
+            "status_code", self.spec.assertions, "http response status_code", reporter
         ) as a:
             assertions.append(a)
-            a.actual_value = response.status_code
+            a.actual_value = status_code
 
-        with Assertion("body", spec.assertions, "http response body", reporter) as a:
+        with Assertion("body", self.spec.assertions, "http response body", reporter) as a:
             # a.result = event.json_deep_equals(a.expected, response.content)
             assertions.append(a)
-            a.actual_value = response.content
+            a.actual_value = content
 
         # TODO: depricate this, not functioally needed anymore
         return all([a.passed() for a in assertions])
@@ -58,18 +164,161 @@ class RequestHttp(Executor):
         return f"RequestHttp {self.spec.execution_mode.represent()} {self.spec.method} to {self.spec.url}"
 
 
+def report_http_timings(timings, reporter):
+    # "http" with the request count comes last
+    for label, metrics in timings.metrics().items():
+        reporter.metrics(label, metrics)
+
+
+class LoadReport:
+    """
+    Results of an open-model load. Latencies are taken from the time a
+    request was scheduled instead of sent, so time spent waiting for a
+    free connection is not omitted when the server slows down.
+    """
+
+    def __init__(self, rate_per_sec, total):
+        self.target_per_sec = rate_per_sec
+        self.total = total
+        self.latency = Timings()
+        self.succeeded = 0
+        self.errors = 0
+        # results of the first failed request, replayed in the report
+        self.first_failure = None
+        self.elapsed = None
+
+    def record(self, passed, latency, buffer):
+        self.latency.record(latency)
+        if passed:
+            self.succeeded += 1
+        else:
+            self.errors += 1
+            if self.first_failure is None:
+                self.first_failure = buffer
+
+    def metrics(self):
+        out = {
+            "sent": len(self.latency),
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.total, 4) if self.total else None,
+            "target_per_sec": self.target_per_sec,
+            "achieved_per_sec": None,
+        }
+        if self.elapsed:
+            out["achieved_per_sec"] = round(self.succeeded / self.elapsed, 1)
+        out.update(self.latency.summary_ms((50, 99)))
+        out["max_ms"] = to_ms(self.latency.max())
+        return out
+
+
 class RequestHttpEvents(Executor):
-    def __init__(self, spec, *args, **kwargs):
+    def __init__(
+        self,
+        spec,
+        *args,
+        session=None,
+        correlations=None,
+        max_in_flight=None,
+        **kwargs,
+    ):
         super().__init__()
         self.execution_mode = spec.execution_mode
         self.spec = spec
         self.nr_of_requests = len(spec.requests)
+        self.session = session
+        self.correlations = correlations
+        # the spec overrides max_in_flight from the config
+        self.max_in_flight = spec.max_in_flight or max_in_flight
 
     def execute(self, reporter):
         if self.nr_of_requests == 0:
             # TODO: Reporter should say "zero events found / specified"
             return False
-        return all([RequestHttp(r).execute(reporter) for r in self.spec.requests])
+        if self.spec.rate_per_sec:
+            return self.execute_open_model(reporter)
+        timings = HttpTimings()
+        executors = [
+            RequestHttp(
+                r, session=self.session, correlations=self.correlations, timings=timings
+            )
+            for r in self.spec.requests
+        ]
+        if self.max_in_flight and self.max_in_flight > 1:
+            results = self.execute_concurrently(executors, reporter)
+        else:
+            results = [e.execute(reporter) for e in executors]
+        report_http_timings(timings, reporter)
+        return all(results)
+
+    def execute_concurrently(self, executors, reporter):
+        # results are buffered per request and reported in the order of the spec
+        buffers = [BufferedResultSet() for _ in executors]
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = [pool.submit(e.execute, b) for e, b in zip(executors, buffers)]
+            results = [f.result() for f in futures]
+        for buffer in buffers:
+            buffer.replay(reporter)
+        return results
+
+    # Requests are started on a fixed schedule, a slow response does not
+    # delay the next one. When max_in_flight requests are waiting, new ones
+    # queue up and that wait counts towards their latency.
+    def execute_open_model(self, reporter):
+        spec = self.spec
+        total = int(spec.rate_per_sec * spec.duration)
+        interval = 1.0 / spec.rate_per_sec
+        load = LoadReport(spec.rate_per_sec, total)
+        in_flight = self.max_in_flight or OPEN_MODEL_IN_FLIGHT
+        timings = HttpTimings()
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=in_flight) as pool:
+            futures = []
+            for i, request in zip(range(total), itertools.cycle(spec.requests)):
+                due = start + i * interval
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self.send_scheduled, request, due, timings))
+            for future in futures:
+                load.record(*future.result())
+        load.elapsed = time.monotonic() - start
+        return self.report_load(load, timings, reporter)
+
+    def send_scheduled(self, request, due, timings):
+        buffer = BufferedResultSet()
+        executor = RequestHttp(
+            request,
+            session=self.session,
+            correlations=self.correlations,
+            timings=timings,
+        )
+        try:
+            passed = executor.execute(buffer)
+        except requests.RequestException as e:
+            passed = executor.assert_response(f"{type(e).__name__} {e}", None, buffer)
+        return passed, time.monotonic() - due, buffer
+
+    def report_load(self, load, timings, reporter):
+        if timings:
+            report_http_timings(timings, reporter)
+        reporter.metrics("open_model", load.metrics())
+        if load.first_failure:
+            load.first_failure.replay(reporter)
+        with Assertion(
+            "requests_succeeded",
+            {"requests_succeeded": load.total},
+            "requests with the expected response",
+            reporter,
+        ) as a:
+            a.actual_value = load.succeeded
+        return a.passed()
 
     def represent(self):
+        if self.spec.rate_per_sec:
+            return (
+                f"RequestHttpEvents {self.spec.execution_mode.represent()} "
+                f"{self.nr_of_requests} events at {self.spec.rate_per_sec}/s "
+                f"for {self.spec.duration}s"
+            )
         return f"RequestHttpEvents {self.spec.execution_mode.represent()} {self.nr_of_requests} events"
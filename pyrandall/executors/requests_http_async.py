@@ -0,0 +1,270 @@
+import asyncio
+import itertools
+import time
+
+try:
+    import aiohttp
+except ImportError:  # optional, installed with pyrandall[async]
+    aiohttp = None
+
+from pyrandall.network import HttpTimings, RequestTiming, headers_size
+from pyrandall.reporter import BufferedResultSet
+from pyrandall.types import FileBody
+
+from .requests_http import (
+    OPEN_MODEL_IN_FLIGHT,
+    LoadReport,
+    RequestHttp,
+    RequestHttpEvents,
+    report_http_timings,
+)
+
+DEFAULT_TIMEOUT = 30.0
+
+
+class Trace:
+    """
+    Timing of one aiohttp request, filled in by the callbacks of
+    trace_config. Times are taken from time.monotonic.
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.connect_start = None
+        self.connect = None
+        self.reused = False
+        self.ttfb = None
+        self.request_bytes = 0
+
+
+def trace_config():
+    config = aiohttp.TraceConfig()
+
+    async def on_connection_create_start(session, context, params):
+        context.trace_request_ctx.connect_start = time.monotonic()
+
+    async def on_connection_create_end(session, context, params):
+        trace = context.trace_request_ctx
+        trace.connect = time.monotonic() - trace.connect_start
+
+    async def on_connection_reuseconn(session, context, params):
+        context.trace_request_ctx.reused = True
+
+    async def on_request_headers_sent(session, context, params):
+        trace = context.trace_request_ctx
+        trace.request_bytes += len(params.method) + len(str(params.url)) + 11
+        trace.request_bytes += headers_size(params.headers)
+
+    async def on_request_chunk_sent(session, context, params):
+        context.trace_request_ctx.request_bytes += len(params.chunk)
+
+    async def on_request_end(session, context, params):
+        # the response headers are in, the body is read after this
+        trace = context.trace_request_ctx
+        trace.ttfb = time.monotonic() - trace.start
+
+    config.on_connection_create_start.append(on_connection_create_start)
+    config.on_connection_create_end.append(on_connection_create_end)
+    config.on_connection_reuseconn.append(on_connection_reuseconn)
+    config.on_request_headers_sent.append(on_request_headers_sent)
+    config.on_request_chunk_sent.append(on_request_chunk_sent)
+    config.on_request_end.append(on_request_end)
+    return config
+
+
+class AsyncEngine:
+    """
+    One event loop and aiohttp session for all http tasks of a run,
+    connections are reused between tasks. Takes the "requests" block
+    of the config, `timeout` (seconds) applies to each request and
+    `pool_size` limits the connections per host (unlimited by default).
+    """
+
+    def __init__(self, config=None):
+        if aiohttp is None:
+            raise ImportError(
+                "the asyncio engine requires aiohttp, install pyrandall[async]"
+            )
+        self.config = config or {}
+        self.timeout = self.config.get("timeout", DEFAULT_TIMEOUT)
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    async def get_session(self):
+        # aiohttp sessions are created on the loop they are used from
+        if self.session is None:
+            # requests in flight are bounded per task, not by the connector
+            connector = aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.config.get("pool_size", 0),
+                force_close=not self.config.get("keep_alive", True),
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[trace_config()],
+            )
+        return self.session
+
+    def close(self):
+        if self.session is not None:
+            self.run(self.session.close())
+        self.loop.close()
+
+
+class AsyncRequestHttp(RequestHttp):
+    """
+    RequestHttp sent from the event loop of an AsyncEngine. A request
+    that times out or fails to connect fails its status_code assertion.
+    """
+
+    def __init__(self, spec, *args, engine=None, **kwargs):
+        super().__init__(spec, *args, **kwargs)
+        self.engine = engine
+
+    def execute(self, reporter):
+        if len(self.spec.assertions) == 0:
+            return False
+        return self.engine.run(self.execute_async(reporter))
+
+    async def execute_async(self, reporter):
+        if self.spec.poll:
+            return await self.execute_polling_async(reporter)
+        return await self.execute_once_async(reporter)
+
+    async def execute_once_async(self, reporter):
+        status_code, content = await self.send()
+        self.record_timing(self.timing, reporter)
+        return self.assert_response(status_code, content, reporter)
+
+    # see RequestHttp.execute_polling
+    async def execute_polling_async(self, reporter):
+        poll = self.spec.poll
+        start = time.monotonic()
+        deadline = start + poll.timeout
+        attempts = 0
+        for delay in poll.delays():
+            attempts += 1
+            buffer = BufferedResultSet()
+            passed = await self.execute_once_async(buffer)
+            now = time.monotonic()
+            if passed or now >= deadline:
+                break
+            # the last attempt is made at the deadline
+            await asyncio.sleep(min(delay, deadline - now))
+        buffer.replay(reporter)
+        reporter.metrics(
+            "poll",
+            {"attempts": attempts, "seconds": round(time.monotonic() - start, 3)},
+        )
+        return passed
+
+    async def send(self):
+        session = await self.engine.get_session()
+        trace = Trace()
+        response_bytes = 0
+        body = self.spec.body or None
+        if isinstance(body, FileBody):
+            # streamed from disk by aiohttp, closed below
+            body = body.open()
+        try:
+            async with session.request(
+                self.spec.method,
+                self.spec.url,
+                headers=self.request_headers(),
+                data=body,
+                trace_request_ctx=trace,
+            ) as response:
+                content = await response.read()
+                response_bytes = headers_size(response.headers) + len(content)
+                return response.status, content
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return f"{type(e).__name__} {e}".strip(), None
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+            total = time.monotonic() - trace.start
+            self.timing = RequestTiming(
+                connect=trace.connect,
+                ttfb=trace.ttfb,
+                total=total,
+                request_bytes=trace.request_bytes,
+                response_bytes=response_bytes,
+                reused=trace.reused,
+            )
+
+
+class AsyncRequestHttpEvents(RequestHttpEvents):
+    """
+    Sends the events of a request from one event loop, with at most
+    max_in_flight requests at a time. Results are reported in order.
+    """
+
+    def __init__(self, spec, *args, engine=None, **kwargs):
+        super().__init__(spec, *args, **kwargs)
+        self.engine = engine
+
+    def execute(self, reporter):
+        if self.nr_of_requests == 0:
+            return False
+        return self.engine.run(self.execute_async(reporter))
+
+    async def execute_async(self, reporter):
+        if self.spec.rate_per_sec:
+            return await self.execute_open_model_async(reporter)
+        in_flight = asyncio.Semaphore(self.max_in_flight or 1)
+        executors = [
+            AsyncRequestHttp(r, engine=self.engine, correlations=self.correlations)
+            for r in self.spec.requests
+        ]
+
+        async def send(executor):
+            async with in_flight:
+                return await executor.send()
+
+        responses = await asyncio.gather(*[send(e) for e in executors])
+        timings = HttpTimings()
+        results = []
+        for executor, (status_code, content) in zip(executors, responses):
+            timings.record(executor.timing)
+            results.append(executor.assert_response(status_code, content, reporter))
+        report_http_timings(timings, reporter)
+        return all(results)
+
+    # see RequestHttpEvents.execute_open_model
+    async def execute_open_model_async(self, reporter):
+        spec = self.spec
+        total = int(spec.rate_per_sec * spec.duration)
+        interval = 1.0 / spec.rate_per_sec
+        load = LoadReport(spec.rate_per_sec, total)
+        timings = HttpTimings()
+        in_flight = asyncio.Semaphore(self.max_in_flight or OPEN_MODEL_IN_FLIGHT)
+        loop = self.engine.loop
+
+        async def send(request, due):
+            executor = AsyncRequestHttp(
+                request, engine=self.engine, correlations=self.correlations
+            )
+            async with in_flight:
+                status_code, content = await executor.send()
+            timings.record(executor.timing)
+            latency = loop.time() - due
+            buffer = BufferedResultSet()
+            passed = executor.assert_response(status_code, content, buffer)
+            return passed, latency, buffer
+
+        start = loop.time()
+        tasks = []
+        for i, request in zip(range(total), itertools.cycle(spec.requests)):
+            due = start + i * interval
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(request, due)))
+        for result in await asyncio.gather(*tasks):
+            load.record(*result)
+        load.elapsed = loop.time() - start
+        return self.report_load(load, timings, reporter)
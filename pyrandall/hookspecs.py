@@ -48,6 +48,9 @@ def pyrandall_parse_http_request_template(filename, data):
     Output dict may contain 'headers', 'method' and 'body'
     The url and path are configured via the yaml spec.
 
+    Not called for files streamed from disk, see `stream_body_size`
+    in the requests config.
+
     :return: dict
     """
 
@@ -1,31 +1,75 @@
 import configparser
 import io
+import itertools
 import logging
 import os
 import sys
+import threading
 import time
 from enum import Enum
-from typing import Dict
+from typing import Dict, NamedTuple
 
-from confluent_kafka.cimpl import Consumer, KafkaError, KafkaException, Producer
+from confluent_kafka.cimpl import (
+    Consumer,
+    KafkaError,
+    KafkaException,
+    TIMESTAMP_NOT_AVAILABLE,
+    Producer,
+    TopicPartition,
+)
+
+from pyrandall.stats import Timings
 
 log = logging.getLogger("kafka")
 
 
+CONSUME_FROM_GROUP = "group"
+CONSUME_FROM_SIMULATE_START = "simulate_start"
+# seconds to wait on the delivery of the connection check
+CHECK_TIMEOUT = 3.0
+# a progress dot is printed per this many produced messages
+PROGRESS_EVERY = 100
+
+
+def config_key(config):
+    return tuple(sorted((k, str(v)) for k, v in config.items()))
+
+
 class ConsumerState(Enum):
     PARTITIONS_UNASSIGNED = 0
     PARTITIONS_ASSIGNED = 1
-    TIMEOUT_SET = 2
 
 
 class KafkaSetupError(Exception):
     pass
 
 
+class Record(NamedTuple):
+    """
+    A consumed message as handed to the validate assertions.
+    """
+
+    value: bytes
+    headers: Dict[str, bytes] = {}
+    # broker timestamp in epoch seconds, None when not available
+    timestamp: float = None
+
+    @classmethod
+    def from_message(cls, msg):
+        headers = {key: value for key, value in msg.headers() or []}
+        kind, ms = msg.timestamp()
+        timestamp = ms / 1000 if kind != TIMESTAMP_NOT_AVAILABLE else None
+        return cls(msg.value(), headers, timestamp)
+
+
 class KafkaConn:
 
-    def __init__(self):
+    def __init__(self, producers=None):
         self.consume_lock = ConsumerState.PARTITIONS_UNASSIGNED
+        # optional ProducerPool shared by the run
+        self.producers = producers
+        self.consumer = None
+        self.assignment = None
 
     # callback for consumer partition assignment,
     # removes lock for actual consumption
@@ -34,7 +78,7 @@ class KafkaConn:
         offsets = consumer.committed(partitions)
         log.info(f"Assignment: {offsets}")
 
-    def check_connection(self):
+    def check_connection(self, producer=None):
         def check_callback(error, event):
             if error:
                 if error.code() == KafkaError._MSG_TIMED_OUT:
@@ -44,11 +88,24 @@ class KafkaConn:
                 log.error(f"Error while producing initial msg: {error}")
                 raise KafkaSetupError()
 
-        config = ConfigFactory(kafka_client="producer").config
-        config["delivery.timeout.ms"] = "3000"  # 3 seconds
-        prod = Producer(config)
+        if producer is None:
+            config = ConfigFactory(kafka_client="producer").config
+            if self.producers is not None:
+                # the pooled producer is checked once, when it is created
+                self.producers.producer(config, self.check_connection)
+                return
+            config["delivery.timeout.ms"] = "3000"  # 3 seconds
+            producer = Producer(config)
+        prod = producer
         prod.produce("pyrandall", "starting simulate", callback=check_callback)
-        prod.flush()  # block until callback is called
+        # block until callback is called, a pooled producer has a longer
+        # delivery timeout so the wait is cut short here
+        if prod.flush(CHECK_TIMEOUT) > 0:
+            log.error(
+                f"No delivery within {CHECK_TIMEOUT} seconds, "
+                "the broker might be down or the connection is misconfigured"
+            )
+            raise KafkaSetupError()
 
     def prod_reporter(self, error, event):
         if error:
@@ -59,11 +116,51 @@ class KafkaConn:
                     partition: {event.partition()}"
             )
 
-    def produce_message(self, topic, body, headers=None, partition_key=None):
-        if headers is None:
-            msg_headers = {}
-        self._produce(topic, body, partition_key, msg_headers)
+    # Enqueue all events before waiting on the broker. Delivery callbacks are
+    # served while producing and only one flush is done at the end, so the
+    # report reflects deliveries confirmed by the broker.
+    # With `total` the bodies are cycled until that many are sent, with
+    # `rate_per_sec` sends are paced at that rate. `stamp` returns the
+    # headers of each send (see pyrandall.correlation).
+    def produce_messages(
+        self,
+        topic,
+        bodies,
+        partition_key=None,
+        report=None,
+        total=None,
+        rate_per_sec=None,
+        stamp=None,
+    ):
+        if report is None:
+            report = DeliveryReport()
+        if total is None:
+            total = len(bodies)
+        interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+
+        start_time = time.monotonic()
+        for i, body in zip(range(total), itertools.cycle(bodies)):
+            if interval:
+                # serve delivery reports while waiting for the next send,
+                # poll returns early when a delivery report was served
+                due = start_time + i * interval
+                delay = due - time.monotonic()
+                while delay > 0:
+                    self.producer.poll(delay)
+                    delay = due - time.monotonic()
+            callback = report.callback(self.prod_reporter)
+            headers = stamp() if stamp else None
+            while not self._produce(topic, body, partition_key, headers, callback):
+                # serve delivery reports to make room in the local queue
+                report.retried += 1
+                self.producer.poll(1)
+            report.sent += 1
+            if report.sent % PROGRESS_EVERY == 0:
+                print(".", end="")
+            self.producer.poll(0)
+        report.elapsed = time.monotonic() - start_time
         self.producer.flush()
+        return report
 
     def init_producer(self):
         log.info("starting produce")
@@ -71,100 +168,367 @@ class KafkaConn:
         config = kafka_config_producer.config
         log.info("kafka config for produce %s", config)
 
+        if self.producers is not None:
+            self.producer = self.producers.acquire(config, self.check_connection)
+            return
         self.check_connection()
         self.producer = Producer(config)
 
-    def _produce(self, topic, msg, partition_key=None, headers=None):
+    def _produce(self, topic, msg, partition_key=None, headers=None, callback=None):
+        if callback is None:
+            callback = self.prod_reporter
+        options = {}
+        if partition_key:
+            options["key"] = partition_key
+        if headers:
+            options["headers"] = headers
         try:
-            if partition_key:
-                self.producer.produce(
-                    topic, msg, key=partition_key, callback=self.prod_reporter
-                )
-            else:
-                self.producer.produce(topic, msg, callback=self.prod_reporter)
-            print(".", end="")
+            self.producer.produce(topic, msg, callback=callback, **options)
+            return True
         except BufferError:
             log.error(
                 "%% Local producer queue is full (%d messages \
                         awaiting delivery): try again",
                 len(self.producer),
             )
+            return False
 
-    # The consume function now contains a lock, the lock is removed when the
-    # partitions are assigned (max 60 seconds). After assignment the regular
-    # timeout are used. These should be set to a couple of seconds in the
-    # scenario itself                      .
-    def consume(self, topic, topic_timeout):
+    def subscribe(self, topic):
         kafka_config_consumer = ConfigFactory(kafka_client="consumer")
         config = kafka_config_consumer.config
         log.info("kafka config for consume %s", config)
-        consumer = Consumer(config)
-
-        events = []
-
-        start_time = time.monotonic()
-        timeout_start_time = start_time
-        timeout_consumer = 10.0
-
-        # actual consumer starts now
+        self.consumer = Consumer(config)
+        # messages received in the same poll as the partition assignment
+        self.buffered = []
         # subscribe to 1 or more topics and define the callback function
         # callback is only received after consumer.consume() is called!
-        consumer.subscribe([topic], on_assign=self.callback_on_assignment)
+        self.consumer.subscribe([topic], on_assign=self.callback_on_assignment)
+
+    # The lock is removed when the partitions are assigned (max 10 seconds).
+    def wait_for_assignment(self, timeout_consumer=10.0):
+        start_time = time.monotonic()
         log.info(f"Waiting for partition assignment ... (timeout at {timeout_consumer} seconds")
         try:
-            while (time.monotonic() - timeout_start_time) < timeout_consumer:
-                # start consumption
-                messages = consumer.consume(timeout=0.1)
-                # check for partition assignment
-                if self.consume_lock == ConsumerState.PARTITIONS_UNASSIGNED:
-                    # this should not happen but we are not 100% sure
-                    if messages:
-                        log.error("messages consumed but lock is unopened")
-                        break
-                    continue
-                # after partition assignment set the timeout again
-                # and reset the start time from which to determine timeout
-                # violation
-                elif self.consume_lock == ConsumerState.PARTITIONS_ASSIGNED:
-                    
-                    timeout_start_time = time.monotonic()
-                    timeout_consumer = topic_timeout
-
-                    self.consume_lock = ConsumerState.TIMEOUT_SET
+            while (time.monotonic() - start_time) < timeout_consumer:
+                messages = self.consumer.consume(timeout=0.1)
+                if self.consume_lock == ConsumerState.PARTITIONS_ASSIGNED:
+                    self.buffered.extend(messages)
                     log.info("Lock has been opened, consuming ...")
+                    return True
+                elif messages:
+                    # this should not happen but we are not 100% sure
+                    log.error("messages consumed but lock is unopened")
+                    break
+        except KafkaException as e:
+            log.error(f"Kafka error: {e}")
+        log.error("No partition assignments received in time")
+        return False
+
+    # Subscribe now and wait for the assignment on a background thread,
+    # this way the group rebalance overlaps with the simulate phase
+    def subscribe_ahead(self, topic):
+        self.subscribe(topic)
+        self.assignment = threading.Thread(
+            target=self.wait_for_assignment, name=f"assign-{topic}", daemon=True
+        )
+        self.assignment.start()
+
+    # Assign the partitions of a topic directly at their current high
+    # watermarks. Only messages produced from this moment on are consumed,
+    # no group coordination is involved.
+    def assign_at_high_watermarks(self, topic, timeout=10.0):
+        config = ConfigFactory(kafka_client="consumer").config
+        config["enable.auto.commit"] = False
+        self.consumer = Consumer(config)
+        self.buffered = []
+
+        # on failure the consumer stays unassigned and consumes nothing
+        try:
+            metadata = self.consumer.list_topics(topic, timeout=timeout)
+            topic_metadata = metadata.topics.get(topic)
+            if topic_metadata is None or topic_metadata.error is not None:
+                error = topic_metadata.error if topic_metadata else "not in metadata"
+                log.error(f"Topic {topic} can not be assigned: {error}")
+                return
+            partitions = []
+            for partition in topic_metadata.partitions:
+                _, high = self.consumer.get_watermark_offsets(
+                    TopicPartition(topic, partition), timeout=timeout
+                )
+                partitions.append(TopicPartition(topic, partition, high))
+        except KafkaException as e:
+            log.error(f"Kafka error: {e}")
+            log.error("No partition assignments made")
+            return
+        log.info(f"Assignment: {partitions}")
+        self.consumer.assign(partitions)
+        self.consume_lock = ConsumerState.PARTITIONS_ASSIGNED
 
-                # appened messages to the events list to be returned
-                if messages:
-                    for msg in messages:
-                        log.info(
-                            f"message at offset: {msg.offset()}, \
-                                partition: {msg.partition()}, \
-                                topic: {msg.topic()}"
-                        )
-                        # TODO: allow assertions to be on message headers etc.
-                        # events.append({
-                        #     "key": msg.key,
-                        #     "headers": msg.headers,
-                        #     "value": msg.value()
-                        # })
-                        events.append(msg.value())
-            # only executed when while condition becomes false
-            else:
-                # at the end check if the partition assignment was achieved
-                if self.consume_lock != ConsumerState.TIMEOUT_SET:
-                    log.error("No partition assignments received in time")
+    # After assignment the regular timeout is used. These should be set
+    # to a couple of seconds in the scenario itself.
+    # Yields the consumed events one by one, consumption stops early once
+    # `until()` holds, after consuming for `grace_period` seconds more to
+    # catch unexpected extra events.
+    def consume(self, topic, topic_timeout, until=None, grace_period=0.0):
+        listener = ConsumeListener(topic_timeout, until=until, grace_period=grace_period)
+        for values in self.poll(topic, [listener]):
+            yield from values
+
+    # Read the topic once and hand every message to all listeners,
+    # until each of them is done
+    def consume_into(self, topic, listeners):
+        for _ in self.poll(topic, listeners):
+            pass
+
+    # Yields batches of consumed events, each batch is handed to the
+    # listeners after the caller is done with it.
+    def poll(self, topic, listeners):
+        if self.consumer is None:
+            self.subscribe(topic)
+            self.wait_for_assignment()
+        elif self.assignment:
+            self.assignment.join()
+
+        start_time = time.monotonic()
+        for listener in listeners:
+            listener.start(start_time)
+        try:
+            if self.consume_lock != ConsumerState.PARTITIONS_ASSIGNED:
+                return
+
+            messages = self.buffered
+            self.buffered = []
+            active = list(listeners)
+            while active:
+                values = []
+                for msg in messages:
+                    log.info(
+                        f"message at offset: {msg.offset()}, \
+                            partition: {msg.partition()}, \
+                            topic: {msg.topic()}"
+                    )
+                    values.append(Record.from_message(msg))
+                if values:
+                    yield values
+                now = time.monotonic()
+                for listener in active:
+                    listener.feed(values, now)
+                active = [listener for listener in active if not listener.done(now)]
+                if active:
+                    messages = self.consumer.consume(timeout=0.1)
 
         except KafkaException as e:
             log.error(f"Kafka error: {e}")
             pass
 
         finally:
-            consumer.close()
+            self.close()
 
         end_time = time.monotonic()
         log.debug(f"this cycle took: {(end_time - start_time)} seconds")
 
-        return events
+    def close(self):
+        if self.consumer is not None:
+            self.consumer.close()
+            self.consumer = None
+
+
+class DeliveryReport:
+    """
+    Accumulates the delivery callbacks of a simulate task: delivered,
+    failed and retried counts and the latency from enqueue to ack.
+    """
+
+    def __init__(self):
+        self.delivered = 0
+        self.failed = 0
+        # produce calls repeated because the local queue was full
+        self.retried = 0
+        self.latency = Timings()
+        self.sent = 0
+        # seconds spent sending, excluding the final flush
+        self.elapsed = 0.0
+
+    def rate_per_sec(self):
+        if not self.elapsed:
+            return None
+        return round(self.sent / self.elapsed, 1)
+
+    def callback(self, on_delivery=None):
+        enqueued = time.monotonic()
+
+        def delivery_callback(error, event):
+            self.latency.record(time.monotonic() - enqueued)
+            if error:
+                self.failed += 1
+            else:
+                self.delivered += 1
+            if on_delivery:
+                on_delivery(error, event)
+
+        return delivery_callback
+
+    def metrics(self):
+        out = {
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rate_per_sec": self.rate_per_sec(),
+        }
+        out.update(self.latency.summary_ms())
+        return out
+
+
+class ConsumeListener:
+    """
+    Hands the consumed events of one validate task to `on_event`.
+    A listener is done after its timeout, or `grace_period` seconds
+    after `until()` first holds.
+    """
+
+    def __init__(self, topic_timeout, on_event=None, until=None, grace_period=0.0):
+        self.timeout = topic_timeout
+        self.on_event = on_event
+        self.until = until
+        self.grace_period = grace_period
+        self.satisfied = False
+        self.deadline = None
+
+    def start(self, now):
+        self.deadline = now + self.timeout
+
+    def feed(self, values, now):
+        if self.on_event:
+            for value in values:
+                self.on_event(value)
+        if values and self.until and not self.satisfied and self.until():
+            self.satisfied = True
+            log.info(f"Assertions satisfied, consuming {self.grace_period} seconds more")
+            self.deadline = min(self.deadline, now + self.grace_period)
+
+    def done(self, now):
+        return now >= self.deadline
+
+
+class SharedConsumer:
+    """
+    One consumer for all validate tasks reading the same topic,
+    the first task to validate consumes on behalf of all listeners.
+    """
+
+    def __init__(self, topic, conn):
+        self.topic = topic
+        self.conn = conn
+        self.listeners = []
+        self.consumed = False
+
+    def consume(self):
+        if not self.consumed:
+            self.consumed = True
+            self.conn.consume_into(self.topic, self.listeners)
+
+    def close(self):
+        if self.conn.assignment:
+            self.conn.assignment.join()
+        self.conn.close()
+
+
+class ConsumerRegistry:
+    """
+    Consumers subscribed ahead of the simulate phase. Validate tasks on
+    the same topic and cluster share a consumer, which also prevents
+    consumers of the same group from splitting the partitions between them.
+
+    With `consume_from` set to "simulate_start" the partitions are assigned
+    at the high watermarks instead, when no simulate phase follows
+    (validate only) the consumer group is used.
+    """
+
+    def __init__(self, snapshot_offsets=True, producers=None):
+        self.pending = {}
+        self.snapshot_offsets = snapshot_offsets
+        # optional ProducerPool, its producer checks the connection
+        self.producers = producers
+
+    def subscribe_ahead(self, topic, listener, consume_from=CONSUME_FROM_GROUP):
+        config = ConfigFactory(kafka_client="consumer").config
+        # keyed on the mode used, simulate_start falls back to the group
+        snapshot = consume_from == CONSUME_FROM_SIMULATE_START and self.snapshot_offsets
+        key = (topic, snapshot, config_key(config))
+        shared = self.pending.get(key)
+        # a topic consumed in an earlier scenario is subscribed again,
+        # that consumer is closed after reading
+        if shared is None or shared.consumed:
+            conn = KafkaConn(producers=self.producers)
+            conn.check_connection()
+            if snapshot:
+                conn.assign_at_high_watermarks(topic)
+            else:
+                conn.subscribe_ahead(topic)
+            self.pending[key] = SharedConsumer(topic, conn)
+        shared = self.pending[key]
+        shared.listeners.append(listener)
+        return shared
+
+    def close(self):
+        for shared in self.pending.values():
+            shared.close()
+        self.pending = {}
+
+
+class ProducerPool:
+    """
+    Hands out producers that stay warm for a whole run.
+    One producer is created per distinct kafka config, the connection
+    is checked once on creation and reused by every simulate task after.
+    """
+
+    def __init__(self):
+        self.producers = {}
+        self.acquired = {}
+
+    def acquire(self, config, check_connection=None):
+        producer = self.producer(config, check_connection)
+        self.acquired[config_key(config)] += 1
+        return producer
+
+    def producer(self, config, check_connection=None):
+        """
+        the producer for config without counting it as acquired,
+        created and checked when there is none yet
+        """
+        key = config_key(config)
+        if key not in self.producers:
+            producer = Producer(config)
+            if check_connection:
+                check_connection(producer)
+            self.producers[key] = producer
+            self.acquired[key] = 0
+        return self.producers[key]
+
+    def flush(self):
+        for producer in self.producers.values():
+            producer.flush()
+
+    def close(self):
+        # librdkafka has no close for producers, flush and release
+        # the references for the handles to be destroyed
+        self.flush()
+        self.producers = {}
+
+    def stats(self):
+        out = []
+        for key, count in self.acquired.items():
+            config = dict(key)
+            out.append(
+                {
+                    "bootstrap.servers": config.get("bootstrap.servers"),
+                    "created": 1,
+                    # a producer created for a connection check is not acquired
+                    "reused": max(count - 1, 0),
+                }
+            )
+        return out
 
 
 class ConfigFactory:
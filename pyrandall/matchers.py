@@ -0,0 +1,495 @@
+import hashlib
+import json
+import math
+import time
+from collections import Counter
+
+from pyrandall.stats import Timings, to_ms
+
+# unexpected events kept as a sample to show in a failure
+UNEXPECTED_SAMPLE_SIZE = 5
+
+
+def normalize(value):
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
+
+
+NOT_JSON = object()
+
+
+def parse(value):
+    """
+    bytes or str holding JSON are parsed, NOT_JSON is returned
+    when they don't. Other values are taken as parsed already.
+    """
+    if isinstance(value, ExpectedEvent):
+        return value.parsed
+    if isinstance(value, (bytes, str)):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return NOT_JSON
+    return value
+
+
+def canonical(value, parsed=None):
+    """
+    JSON events (also when given as bytes or str) are serialized with
+    sorted keys, without whitespace and with integral floats as ints.
+    Anything that is not JSON is compared byte for byte.
+    """
+    if parsed is None:
+        parsed = parse(value)
+    if parsed is NOT_JSON:
+        return value if isinstance(value, bytes) else value.encode()
+    return json.dumps(
+        normalize(parsed), sort_keys=True, separators=(",", ":"), default=repr
+    ).encode()
+
+
+def digest(value):
+    # expected events carry a precomputed digest
+    if isinstance(value, ExpectedEvent):
+        return value.digest
+    return hashlib.sha1(canonical(value)).digest()
+
+
+class ExpectedEvent(bytes):
+    """
+    An expected event as formatted by the pyrandall_format_*_equals_to_event
+    hooks. Compares as the plain bytes, the parsed object, canonical
+    form and digest are derived once when the result file is read.
+    """
+
+    def __new__(cls, data):
+        event = super().__new__(cls, data)
+        event.parsed = parse(data)
+        event.canonical = canonical(data, event.parsed)
+        event.digest = hashlib.sha1(event.canonical).digest()
+        return event
+
+
+class UnorderedMatcher:
+    """
+    Matches events against the expected events as they arrive.
+    Events are compared by the digest of their canonical form, a multiset
+    of digests keeps the expectations not matched yet. Unexpected events
+    are counted (and a small sample is kept for the report).
+    """
+
+    def __init__(self, expected):
+        self.unmatched = Counter()
+        self.originals = {}
+        for value in expected:
+            key = digest(value)
+            self.unmatched[key] += 1
+            self.originals.setdefault(key, value)
+        self.received = 0
+        self.unexpected = 0
+        self.unexpected_sample = []
+
+    def feed(self, value):
+        self.received += 1
+        key = digest(value)
+        if self.unmatched[key] > 0:
+            self.unmatched[key] -= 1
+            if not self.unmatched[key]:
+                del self.unmatched[key]
+                del self.originals[key]
+        else:
+            self.unexpected += 1
+            if len(self.unexpected_sample) < UNEXPECTED_SAMPLE_SIZE:
+                self.unexpected_sample.append(value)
+
+    def satisfied(self):
+        # more events can only be unexpected ones
+        return not self.unmatched
+
+    def passed(self):
+        return self.satisfied() and self.unexpected == 0
+
+    def missing(self):
+        return [self.originals[key] for key in self.unmatched.elements()]
+
+
+class OrderedMatcher:
+    """
+    Matches events against the expected events in order, any other
+    event fails. Only the position in the sequence and the first
+    mismatch are kept.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.position = 0
+        self.received = 0
+        self.mismatch = None
+
+    def feed(self, value):
+        self.received += 1
+        if self.mismatch:
+            return
+        expected = None
+        if self.position < len(self.expected):
+            expected = self.expected[self.position]
+        if expected is not None and digest(value) == digest(expected):
+            self.position += 1
+        else:
+            self.mismatch = (self.received - 1, expected, value)
+
+    def satisfied(self):
+        return self.position == len(self.expected) and not self.mismatch
+
+    def passed(self):
+        return self.satisfied()
+
+    def summary(self):
+        return f"{self.position} of {len(self.expected)} events in order"
+
+    def failure(self):
+        if self.mismatch:
+            index, expected, value = self.mismatch
+            return f"event {index} expected {expected}, but got {value}"
+        return self.summary()
+
+
+class FirstEventMatcher:
+    """
+    Keeps the first event only.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.digest = digest(expected)
+        self.event = None
+        self.received = 0
+
+    def feed(self, value):
+        self.received += 1
+        if self.received == 1:
+            self.event = value
+
+    def passed(self):
+        return self.received > 0 and digest(self.event) == self.digest
+
+    def satisfied(self):
+        return self.passed()
+
+    def summary(self):
+        return f"{self.received} events"
+
+    def failure(self):
+        if not self.received:
+            return f"expected {self.expected}, but got no events"
+        return f"expected {self.expected}, but got {self.event}"
+
+
+class LastEventMatcher(FirstEventMatcher):
+    """
+    Keeps the last event only. Any event consumed later replaces
+    it, so it can only be satisfied along with total_events.
+    """
+
+    def feed(self, value):
+        self.received += 1
+        self.event = value
+
+
+MISSING = object()
+
+
+def compile_path(path):
+    """
+    A dotted path like "user.orders.0.id" is split once into its keys,
+    keys of digits also index into lists.
+    """
+    return tuple(int(key) if key.isdigit() else key for key in path.split("."))
+
+
+def lookup(parsed, keys):
+    for key in keys:
+        if isinstance(parsed, dict):
+            parsed = parsed.get(str(key), MISSING)
+        elif isinstance(parsed, list) and isinstance(key, int) and key < len(parsed):
+            parsed = parsed[key]
+        else:
+            return MISSING
+    return parsed
+
+
+def leaf_paths(document, prefix=()):
+    # nested objects are walked, anything else is compared as a whole
+    for key, value in document.items():
+        if isinstance(value, dict) and value:
+            yield from leaf_paths(value, prefix + (key,))
+        else:
+            yield prefix + (key,), value
+
+
+class Subset:
+    """
+    A partial event compiled to (keys, expected value) predicates.
+    Called with a parsed event, it is true when every path is present
+    and holds the expected value. Other fields are ignored.
+    """
+
+    def __init__(self, predicates, name):
+        self.predicates = [(keys, normalize(value)) for keys, value in predicates]
+        self.name = name
+
+    @classmethod
+    def compile(cls, document=None, fields=None, name=None):
+        predicates = []
+        if document is not None:
+            if not isinstance(document, dict):
+                raise ValueError(f"subset {name} is not a json object")
+            predicates.extend(leaf_paths(document))
+        for path, value in (fields or {}).items():
+            predicates.append((compile_path(path), value))
+        return cls(predicates, name or str(fields))
+
+    def __call__(self, parsed):
+        return all(
+            normalize(lookup(parsed, keys)) == value for keys, value in self.predicates
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class SubsetMatcher:
+    """
+    Matches events against compiled subsets in any order, each subset
+    needs its own event. An event that satisfies several subsets can be
+    reassigned when a later event only fits the subset it took, so the
+    most subsets possible are matched. Events that match none are unexpected.
+    """
+
+    def __init__(self, subsets):
+        self.subsets = subsets
+        # per subset the number of the event assigned to it
+        self.owners = [None] * len(subsets)
+        # per assigned event the subsets it satisfies
+        self.satisfies = {}
+        self.received = 0
+        self.unexpected = 0
+        self.unexpected_sample = []
+
+    @property
+    def pending(self):
+        return [s for s, owner in zip(self.subsets, self.owners) if owner is None]
+
+    def feed(self, value):
+        self.received += 1
+        parsed = parse(value)
+        if parsed is not NOT_JSON:
+            satisfies = [i for i, subset in enumerate(self.subsets) if subset(parsed)]
+            self.satisfies[self.received] = satisfies
+            if self.assign(self.received, set()):
+                return
+            del self.satisfies[self.received]
+        self.unexpected += 1
+        if len(self.unexpected_sample) < UNEXPECTED_SAMPLE_SIZE:
+            self.unexpected_sample.append(value)
+
+    def assign(self, event, visited):
+        # augmenting path: take a free subset, or move its owner to another one
+        for i in self.satisfies[event]:
+            if i in visited:
+                continue
+            visited.add(i)
+            owner = self.owners[i]
+            if owner is None or self.assign(owner, visited):
+                self.owners[i] = event
+                return True
+        return False
+
+    def satisfied(self):
+        return None not in self.owners
+
+    def passed(self):
+        return self.satisfied() and self.unexpected == 0
+
+    def summary(self):
+        matched = len(self.subsets) - len(self.pending)
+        return f"{matched} of {len(self.subsets)} subsets matched by {self.received} events"
+
+    def failure(self):
+        missing = ", ".join(str(subset) for subset in self.pending)
+        return (
+            f"{self.summary()}, not matched: [{missing}], "
+            f"{self.unexpected} unexpected events: {self.unexpected_sample}"
+        )
+
+
+class LatencyMatcher:
+    """
+    End-to-end latencies of the correlated events, passes when
+    the slowest of them arrived within `limit` seconds.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.timings = Timings()
+
+    def record(self, seconds):
+        self.timings.record(seconds)
+
+    def passed(self):
+        return len(self.timings) > 0 and self.timings.max() <= self.limit
+
+    def summary(self):
+        return f"max latency {to_ms(self.timings.max())}ms of {len(self.timings)} correlated events"
+
+    def failure(self):
+        if not self.timings:
+            return "no correlated events received"
+        return f"{self.summary()}, expected under {to_ms(self.limit)}ms"
+
+    def metrics(self):
+        out = {"events": len(self.timings)}
+        out.update(self.timings.summary_ms((50, 95, 99)))
+        out["max_ms"] = to_ms(self.timings.max())
+        return out
+
+
+class ThroughputMatcher:
+    """
+    Rate of the consumed events by their broker timestamps. With a
+    `window` (seconds) the slowest window between those of the first
+    and last event counts, an empty window counts as a stall. Without
+    one, or without such windows, the rate over the whole span counts.
+    Only a count per window is kept, events may arrive out of order.
+    """
+
+    def __init__(self, expected):
+        self.min_per_sec = expected["min_events_per_sec"]
+        self.window = expected.get("window")
+        self.windows = Counter()
+        self.count = 0
+        self.first = None
+        self.last = None
+
+    def record(self, timestamp):
+        self.count += 1
+        if self.first is None:
+            self.first = self.last = timestamp
+        self.first = min(self.first, timestamp)
+        self.last = max(self.last, timestamp)
+        if self.window:
+            self.windows[self.window_of(timestamp)] += 1
+
+    def window_of(self, timestamp):
+        return math.floor(timestamp / self.window)
+
+    def full_windows(self):
+        if not self.window or self.first is None:
+            return []
+        # the windows of the first and last event are partial
+        return range(self.window_of(self.first) + 1, self.window_of(self.last))
+
+    def per_sec(self):
+        full = self.full_windows()
+        if full:
+            return min(self.windows[i] for i in full) / self.window
+        span = (self.last - self.first) if self.count else 0.0
+        if span <= 0:
+            return None
+        return self.count / span
+
+    def passed(self):
+        rate = self.per_sec()
+        return rate is not None and rate >= self.min_per_sec
+
+    def summary(self):
+        rate = self.per_sec()
+        if rate is None:
+            return f"{self.count} events, too few to measure a rate"
+        full = self.full_windows()
+        if full:
+            return f"{rate:.1f} events/sec in the slowest of {len(full)} windows of {self.window}s"
+        return f"{rate:.1f} events/sec over {self.count} events"
+
+    def failure(self):
+        return f"{self.summary()}, expected at least {self.min_per_sec} events/sec"
+
+    def metrics(self):
+        rate = self.per_sec()
+        return {
+            "events": self.count,
+            "per_sec": round(rate, 1) if rate is not None else None,
+            "min_per_sec": self.min_per_sec,
+        }
+
+
+# assert_that_received fields matched while consuming
+MATCHERS = {
+    "unordered": UnorderedMatcher,
+    "ordered": OrderedMatcher,
+    "first_event": FirstEventMatcher,
+    "last_event": LastEventMatcher,
+    "matches_subset": SubsetMatcher,
+}
+
+
+class ReceivedEvents:
+    """
+    State of assert_that_received for one validate task, fed one
+    consumed event at a time instead of collecting all of them.
+    """
+
+    def __init__(self, assertions, correlations=None):
+        self.assertions = assertions
+        self.correlations = correlations
+        self.total = 0
+        self.matchers = {
+            field: matcher(assertions[field])
+            for field, matcher in MATCHERS.items()
+            if field in assertions
+        }
+        self.latency = LatencyMatcher(assertions.get("latency_under"))
+        self.throughput = None
+        if "throughput" in assertions:
+            self.throughput = ThroughputMatcher(assertions["throughput"])
+
+    def receive(self, record):
+        """
+        Takes a consumed pyrandall.kafka.Record, the latency of correlated
+        events and throughput are taken from the broker timestamp
+        (or now, without one).
+        """
+        received_at = record.timestamp or time.time()
+        if self.throughput:
+            self.throughput.record(received_at)
+        if self.correlations:
+            seconds = self.correlations.latency(record.headers, received_at)
+            if seconds is not None:
+                self.latency.record(seconds)
+        self.feed(record.value)
+
+    def feed(self, value):
+        self.total += 1
+        for matcher in self.matchers.values():
+            matcher.feed(value)
+
+    # True when consuming more events can only add unexpected ones
+    def satisfied(self):
+        if "total_events" not in self.assertions and not self.matchers:
+            return False
+        if "total_events" in self.assertions:
+            expected = self.assertions["total_events"]
+            # an empty topic is only proven by the full timeout
+            if expected == 0 or self.total < expected:
+                return False
+        elif "last_event" in self.matchers:
+            # a later event may still replace the last one
+            return False
+        return all(matcher.satisfied() for matcher in self.matchers.values())
@@ -1,6 +1,17 @@
 import posixpath
+import threading
+import time
+from typing import NamedTuple
 from urllib.parse import urljoin, urlparse
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from pyrandall.stats import Timings, to_ms
+
+DEFAULT_POOL_SIZE = 10
+
 
 def extend_url(base, path):
     url_parsed = urlparse(base)
@@ -19,3 +30,145 @@ def join_urlpath(url, urlpath=None):
         return url + "/"
     else:
         return extend_url(url, urlpath)
+
+
+def pool_size(config, in_flight=None):
+    # a connection for each request in flight
+    in_flight = in_flight or config.get("max_in_flight", 1)
+    return config.get("pool_size", max(DEFAULT_POOL_SIZE, in_flight))
+
+
+def create_session(config=None, in_flight=None):
+    """
+    A session shared by all http tasks of a run, connections are kept
+    alive and pooled per host. Takes the "requests" block of the config:
+    `pool_size` connections are kept per host, `keep_alive: false`
+    closes each connection after its response. Without a pool_size
+    the pool fits `in_flight` concurrent requests.
+    """
+    config = config or {}
+    size = pool_size(config, in_flight)
+    session = requests.Session()
+    adapter = TimingAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not config.get("keep_alive", True):
+        session.headers["Connection"] = "close"
+    return session
+
+
+# time spent connecting by the requests of each thread
+_connects = threading.local()
+
+
+def take_connect_time():
+    """
+    Seconds spent on connecting (TCP and TLS) by this thread since the
+    last call, None when no new connection was made.
+    """
+    seconds = getattr(_connects, "seconds", None)
+    _connects.seconds = None
+    return seconds
+
+
+def record_connect_time(seconds):
+    _connects.seconds = (getattr(_connects, "seconds", None) or 0.0) + seconds
+
+
+def timed_pool(pool_cls):
+    class TimedConnectionPool(pool_cls):
+        # connections time their connect, the connection class is left
+        # as is (it is patched by vcrpy in tests)
+        def _new_conn(self):
+            conn = super()._new_conn()
+            connect = conn.connect
+
+            def timed_connect():
+                start = time.monotonic()
+                try:
+                    return connect()
+                finally:
+                    record_connect_time(time.monotonic() - start)
+
+            conn.connect = timed_connect
+            return conn
+
+    return TimedConnectionPool
+
+
+class TimingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter of which the connections record their connect time,
+    see take_connect_time.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": timed_pool(HTTPConnectionPool),
+            "https": timed_pool(HTTPSConnectionPool),
+        }
+
+
+def measures_connect(http):
+    return isinstance(http, requests.Session) and isinstance(
+        http.get_adapter("http://"), TimingAdapter
+    )
+
+
+def headers_size(headers):
+    # approximate size on the wire, "name: value\r\n" per header
+    return sum(len(str(k)) + len(str(v)) + 4 for k, v in (headers or {}).items())
+
+
+class RequestTiming(NamedTuple):
+    # seconds, connect is None when the connection was reused
+    connect: float
+    ttfb: float
+    total: float
+    request_bytes: int
+    response_bytes: int
+    # None when it was not measured
+    reused: bool
+
+
+class HttpTimings:
+    """
+    Timing breakdown of the requests of one task, summarized
+    as min/mean/p95/p99/max per phase for the report.
+    """
+
+    def __init__(self):
+        # appending is safe from concurrent requests
+        self.timings = []
+
+    def record(self, timing):
+        self.timings.append(timing)
+
+    def __len__(self):
+        return len(self.timings)
+
+    def metrics(self):
+        out = {}
+        for phase in ("connect", "ttfb", "total"):
+            values = Timings()
+            for timing in self.timings:
+                if getattr(timing, phase) is not None:
+                    values.record(getattr(timing, phase))
+            if values:
+                out[f"http_{phase}"] = summary_ms(values)
+        reused = [t.reused for t in self.timings if t.reused is not None]
+        out["http"] = {
+            "requests": len(self.timings),
+            "reused": sum(reused) if reused else None,
+            "request_bytes": sum(t.request_bytes for t in self.timings),
+            "response_bytes": sum(t.response_bytes for t in self.timings),
+        }
+        return out
+
+
+def summary_ms(values):
+    out = {"min_ms": to_ms(values.min()), "mean_ms": to_ms(values.mean())}
+    out.update(values.summary_ms((95, 99)))
+    out["max_ms"] = to_ms(values.max())
+    return out
@@ -13,6 +13,10 @@ class Reporter(object):
         self.results = []
         # failures are kept for printing at the end of a run
         self.failures = []
+        # scenarios with their wall time, tasks with the metrics they reported
+        self.scenarios = []
+        self.tasks = []
+        self.phase = None
 
     def feature(self, text):
         """
@@ -29,6 +33,10 @@ class Reporter(object):
             uses Scenario interface to get the title / description data
         """
         print(f"{SPACE}Scenario {text}")
+        self.scenarios.append({"scenario": text, "seconds": None})
+
+    def scenario_time(self, seconds):
+        self.scenarios[-1]["seconds"] = round(seconds, 3)
 
     # TODO: move this to commander
     def create_and_track_resultset(self):
@@ -43,6 +51,7 @@ class Reporter(object):
             uses Scenario interface to get the title / description data
         """
         print(f"{ONE_SPACE}Simulate")
+        self.phase = "simulate"
 
     def validate(self):
         """
@@ -51,9 +60,23 @@ class Reporter(object):
             uses Scenario interface to get the title / description data
         """
         print(f"{ONE_SPACE}Validate")
+        self.phase = "validate"
 
     def run_task(self, text):
         print(f"{ONE_SPACE}{text}")
+        scenario = self.scenarios[-1]["scenario"] if self.scenarios else None
+        self.tasks.append(
+            {"scenario": scenario, "phase": self.phase, "task": text, "metrics": {}}
+        )
+
+    def task_time(self, seconds):
+        self.print_metrics("wall_time", {"seconds": round(seconds, 3)})
+
+    def print_metrics(self, label, values):
+        formatted = ", ".join(f"{k}={v}" for k, v in values.items())
+        print(f"{TWO_SPACE}{label}: {formatted}")
+        if self.tasks:
+            self.tasks[-1]["metrics"][label] = values
 
     def print_assertion_failed(self, assertion_call, fail_text):
         # TODO: add assertion type (equal, greater than)
@@ -74,6 +97,24 @@ class Reporter(object):
     def assertion(self, field, spec):
         return Assertion(field, spec, self)
 
+    def producer_pool(self, stats):
+        for item in stats:
+            print(
+                f"Kafka producer {item['bootstrap.servers']}: "
+                f"created {item['created']}, reused {item['reused']} times"
+            )
+
+    def baseline_missing(self, path):
+        print(f"\nBaseline {path} not found, nothing to compare")
+
+    def print_regressions(self, regressions, tolerance):
+        if regressions:
+            print(f"\nSlower than the baseline (tolerance {tolerance:.0%}):")
+            for regression in regressions:
+                print(f"{ONE_SPACE}{regression}")
+        else:
+            print(f"\nNo regressions against the baseline (tolerance {tolerance:.0%})")
+
     def print_failures(self):
         if self.failures:
             print("\nFailures:")
@@ -106,7 +147,36 @@ class ResultSet:
         self.reporter.print_assertion_passed(assertion_call)
         self.assertions.append(True)
 
+    def metrics(self, label, values):
+        self.reporter.print_metrics(label, values)
+
     def assertion_skipped(self, assertion_call: AssertionCall):
         self.reporter.print_assertion_skipped(assertion_call)
         # True right?
         self.assertions.append(True)
+
+
+class BufferedResultSet:
+    """
+    Keeps the results of a task that runs concurrently with others,
+    replayed on a ResultSet in a deterministic order afterwards.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def assertion_failed(self, assertion_call, fail_text):
+        self.calls.append(("assertion_failed", (assertion_call, fail_text)))
+
+    def assertion_passed(self, assertion_call: AssertionCall):
+        self.calls.append(("assertion_passed", (assertion_call,)))
+
+    def assertion_skipped(self, assertion_call: AssertionCall):
+        self.calls.append(("assertion_skipped", (assertion_call,)))
+
+    def metrics(self, label, values):
+        self.calls.append(("metrics", (label, values)))
+
+    def replay(self, resultset):
+        for name, args in self.calls:
+            getattr(resultset, name)(*args)
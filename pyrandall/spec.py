@@ -6,11 +6,15 @@ import yaml
 
 import pyrandall.behaviors
 from pyrandall import const
+from pyrandall.cache import FileCache
 from pyrandall.exceptions import InvalidSchenarioVersion
+from pyrandall.matchers import ExpectedEvent, Subset, parse
 from pyrandall.types import (
     Adapter,
     BrokerKafkaSpec,
     ExecutionMode,
+    FileBody,
+    PollPolicy,
     RequestEventsSpec,
     RequestHttpSpec,
 )
@@ -18,8 +22,18 @@ from pyrandall.types import (
 from .network import join_urlpath
 
 
+def hook_key(hook):
+    # a pluggy hook is keyed by its registered implementations
+    get_hookimpls = getattr(hook, "get_hookimpls", None)
+    if get_hookimpls is None:
+        return hook
+    return tuple(impl.function for impl in get_hookimpls())
+
+
 class V2Factory(object):
     def __init__(self, **kwargs):
+        # files read while building the spec are shared by all scenarios
+        kwargs.setdefault("file_cache", FileCache())
         self.kwargs = kwargs
 
     def feature(self, data):
@@ -89,6 +103,8 @@ class ScenarioGroup(object):
         # some tests don't pass this argument, but should
         # TODO: remove default argument?
         hook=pyrandall.behaviors,
+        file_cache=None,
+        requests=None,
         **kwargs,
     ):
 
@@ -102,6 +118,10 @@ class ScenarioGroup(object):
             raise ValueError("missing argument schemas_url")
         self.schema_server_url = schemas_url
         self.hook = hook
+        self.file_cache = file_cache if file_cache is not None else FileCache()
+        # the "requests" block of the config, event files of stream_body_size
+        # bytes or larger are streamed from disk (off when not set)
+        self.stream_body_size = (requests or {}).get("stream_body_size")
         self.simulate_tasks = self.build_simulate_tasks(data)
         self.validate_tasks = self.build_validate_tasks(data)
 
@@ -131,7 +151,14 @@ class ScenarioGroup(object):
             o = self.build_simulate_request(spec, fpath)
             out.append(o)
         del spec["assert_that_responded"]
-        return RequestEventsSpec(requests=out, adapter=Adapter.REQUEST_HTTP_EVENTS)
+        duration = spec.get("duration")
+        return RequestEventsSpec(
+            requests=out,
+            max_in_flight=spec.get("max_in_flight"),
+            rate_per_sec=spec.get("rate_per_sec"),
+            duration=self.convert_timeout(duration) if duration else None,
+            adapter=Adapter.REQUEST_HTTP_EVENTS,
+        )
 
     def build_simulate_request(self, spec, fpath):
         if self.default_request_url is None:
@@ -149,8 +176,10 @@ class ScenarioGroup(object):
             assertions=assertions,
             method=request.get("method", spec.get("method", "POST")),
             url=join_urlpath(self.default_request_url, spec.get("path", None)),
-            headers=request.get("headers", {}),
+            # the template is cached and shared, headers are updated per request
+            headers=dict(request.get("headers", {})),
             body=request.get("body", None),
+            stamp_correlation_id=spec.get("stamp_correlation_id", False),
             adapter=None
         )
 
@@ -159,11 +188,21 @@ class ScenarioGroup(object):
         for fpath in spec.get("events", []):
             events.append(self.parse_broker_produce_template(fpath))
 
-        assertions = {"events_produced": {"equals_to": len(events)}}
+        rate_per_sec = spec.get("rate_per_sec")
+        if "duration" in spec:
+            # schema requires rate_per_sec along with duration
+            total = int(rate_per_sec * self.convert_timeout(spec["duration"]))
+        else:
+            total = len(events) * spec.get("repeat", 1)
+
+        assertions = {"events_produced": {"equals_to": total}}
         return BrokerKafkaSpec(
             execution_mode=ExecutionMode.SIMULATING,
             adapter=Adapter.BROKER_KAFKA,
             events=events,
+            produce_total=total,
+            rate_per_sec=rate_per_sec,
+            stamp_correlation_id=spec.get("stamp_correlation_id", False),
             assertions=self.flatten_assertions(Adapter.BROKER_KAFKA, assertions),
             topic=spec["topic"],
         )
@@ -194,10 +233,14 @@ class ScenarioGroup(object):
         assertions = {}
         atr = spec.get("assert_that_responded", {})
         assertions.update(self.flatten_assertions(Adapter.REQUESTS_HTTP, atr))
+        poll = None
+        if "timeout_after" in assertions:
+            poll = self.poll_policy(assertions.pop("timeout_after"), atr.get("poll", {}))
 
         # build according to scenario/v2 schema
         return RequestHttpSpec(
             execution_mode=ExecutionMode.VALIDATING,
+            poll=poll,
             adapter=Adapter.REQUESTS_HTTP,
             assertions=assertions,
             method=spec.get("method", "GET"),
@@ -214,8 +257,19 @@ class ScenarioGroup(object):
             events=[],
             assertions=assertions,
             topic=spec["topic"],
+            consume_from=spec.get("consume_from", "group"),
         )
 
+    def poll_policy(self, timeout, raw):
+        options = {}
+        for key in ("interval", "max_interval"):
+            if key in raw:
+                options[key] = self.convert_timeout(raw[key])
+        for key in ("backoff", "jitter"):
+            if key in raw:
+                options[key] = raw[key]
+        return PollPolicy(timeout=timeout, **options)
+
     def flatten_assertions(self, adapter, raw):
         out = {}
         for key, value in raw.items():
@@ -225,7 +279,7 @@ class ScenarioGroup(object):
                 out[key] = self.format_equals_to_event_file(
                     adapter, value["equals_to_event"]
                 )
-            if "timeout_after" == key:
+            if key in ("timeout_after", "grace_period", "latency_under"):
                 out[key] = self.convert_timeout(value)
         return out
 
@@ -235,25 +289,38 @@ class ScenarioGroup(object):
         if "assert_that_empty" in spec:
             # alias for more verbose syntax like:
             # is it enough?
-            assertions.update(
-                self.flatten_assertions({"total_events": {"equals_to": 0}})
-            )
-        elif (
-            "assert_that_received" in spec
-            and "unordered" in spec["assert_that_received"]
-        ):
+            sub = dict(spec["assert_that_empty"], total_events={"equals_to": 0})
+            assertions.update(self.flatten_assertions(adapter, sub))
+        elif "assert_that_received" in spec:
             sub = spec["assert_that_received"]
             assertions.update(self.flatten_assertions(adapter, sub))
-            assertions.update(
-                {
-                    "messages": [
-                        self.flatten_assertions(adapter, {"value": item})
-                        for item in sub["unordered"]
+            for key in ("unordered", "ordered"):
+                if key in sub:
+                    assertions[key] = [
+                        self.flatten_assertions(adapter, {"value": item})["value"]
+                        for item in sub[key]
                     ]
+            if "throughput" in sub:
+                window = sub["throughput"].get("window")
+                assertions["throughput"] = {
+                    "min_events_per_sec": sub["throughput"]["min_events_per_sec"],
+                    "window": self.convert_timeout(window) if window else None,
                 }
-            )
+            if "matches_subset" in sub:
+                assertions["matches_subset"] = [
+                    self.compile_subset(adapter, item)
+                    for item in sub["matches_subset"]
+                ]
         return assertions
 
+    def compile_subset(self, adapter, item):
+        # compiled once here, consumed events are only parsed when validating
+        document, name = None, None
+        if "equals_to_event" in item:
+            name = item["equals_to_event"]
+            document = parse(self.format_equals_to_event_file(adapter, name))
+        return Subset.compile(document, item.get("fields"), name)
+
     def convert_timeout(self, timeout):
         # timeout can be '10s' , '10m', '10ms'
         ms = re.compile(r"[0-9]*ms$")
@@ -271,27 +338,49 @@ class ScenarioGroup(object):
             )
 
     def parse_http_request_template(self, fpath):
-        with open(self.build_event_path(fpath), "r") as f:
-            return self.hook.pyrandall_parse_http_request_template(
-                filename=fpath, data=f.read()
-            )
+        path = self.build_event_path(fpath)
+        size = os.path.getsize(path)
+        if self.stream_body_size is not None and size >= self.stream_body_size:
+            # sent as is, the template hook would need the file in memory
+            headers = {"content-type": "application/json"} if ".json" in fpath else {}
+            return {"headers": headers, "body": FileBody(path, size)}
+        return self.parse_template(self.hook.pyrandall_parse_http_request_template, fpath)
 
     def parse_broker_produce_template(self, fpath):
-        with open(self.build_event_path(fpath), "r") as f:
-            return self.hook.pyrandall_parse_broker_produce_template(
-                filename=fpath, data=f.read()
-            )
+        return self.parse_template(self.hook.pyrandall_parse_broker_produce_template, fpath)
+
+    def parse_template(self, parse, fpath):
+        # templates are parsed once per run for every scenario referencing them
+        path = self.build_event_path(fpath)
+        return self.file_cache.get(
+            path, lambda: self.read_template(parse, path, fpath), hook_key(parse)
+        )
+
+    def read_template(self, parse, path, fpath):
+        with open(path, "r") as f:
+            return parse(filename=fpath, data=f.read())
 
     def format_equals_to_event_file(self, adapter, fpath):
-        with open(self.build_result_path(fpath), "r") as f:
+        path = self.build_result_path(fpath)
+        return self.file_cache.get(
+            path, lambda: self.read_equals_to_event_file(adapter, path, fpath), adapter
+        )
+
+    def read_equals_to_event_file(self, adapter, path, fpath):
+        data = None
+        with open(path, "r") as f:
             if adapter == Adapter.REQUESTS_HTTP:
-                return self.hook.pyrandall_format_http_request_equals_to_event(
+                data = self.hook.pyrandall_format_http_request_equals_to_event(
                     filename=fpath, data=f.read()
                 )
             if adapter == Adapter.BROKER_KAFKA:
-                return self.hook.pyrandall_format_kafka_equals_to_event(
+                data = self.hook.pyrandall_format_kafka_equals_to_event(
                     filename=fpath, data=f.read()
                 )
+        # plugins may format to something else than bytes
+        if isinstance(data, bytes):
+            return ExpectedEvent(data)
+        return data
 
     def build_event_path(self, fname):
         return os.path.join(self.events_path, fname)
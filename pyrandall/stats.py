@@ -0,0 +1,47 @@
+import math
+
+
+class Timings:
+    """
+    Recorded durations in seconds, summarized as percentiles
+    for the report. Percentiles use the nearest-rank method.
+    """
+
+    def __init__(self):
+        self.values = []
+
+    # appending is safe from concurrent tasks
+    def record(self, value):
+        self.values.append(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def percentile(self, p):
+        if not self.values:
+            return None
+        # sorting is linear when sorted already
+        self.values.sort()
+        rank = math.ceil(p / 100 * len(self.values))
+        return self.values[max(rank, 1) - 1]
+
+    def min(self):
+        return self.percentile(0)
+
+    def max(self):
+        return self.percentile(100)
+
+    def mean(self):
+        if not self.values:
+            return None
+        return sum(self.values) / len(self.values)
+
+    def summary_ms(self, percentiles=(50, 99)):
+        out = {f"p{p}_ms": to_ms(self.percentile(p)) for p in percentiles}
+        return out
+
+
+def to_ms(seconds):
+    if seconds is None:
+        return None
+    return round(seconds * 1000, 3)
@@ -1,9 +1,12 @@
+import random
 from enum import Enum, Flag, auto
 from typing import Any, Dict, List, NamedTuple
 
 import jsondiff
 from deepdiff import DeepDiff
 
+from pyrandall.matchers import UnorderedMatcher
+
 
 class ExecutionMode(Enum):
     SIMULATING = auto()
@@ -82,6 +85,14 @@ class UnorderedDiffAssertion(Assertion):
         return UnorderedCompare(expected_value=value)
 
 
+class MatcherAssertion(Assertion):
+    def __init__(self, field: str, spec: Dict, on_fail_text, resultset):
+        super().__init__(field, spec, on_fail_text, resultset)
+
+    def create_assertion(self, value):
+        return MatcherCall(expected_value=value)
+
+
 class AssertionCall:
     def __init__(self, expected_value):
         self.expected = expected_value
@@ -107,41 +118,107 @@ class AssertionCall:
         return self.called and self.result
 
     def __str__(self):
+        # rendered when reported, values are cut to keep the output readable
+        expected, actual = shorten(self.expected), shorten(self.actual)
         if self.passed():
-            return f"assertion passed, expected {self.expected}, and got {self.actual}"
+            return f"assertion passed, expected {expected}, and got {actual}"
         else:
-            return f"assertion failed, expected {self.expected}, but got {self.actual}"
+            return f"assertion failed, expected {expected}, but got {actual}"
 
 
 class UnorderedCompare(AssertionCall):
     def __init__(self, expected_value):
         super().__init__(expected_value)
-        self.diff = None
+        self.matcher = None
+        self._diff = None
 
     def eval(self, actual_value):
+        """
+        actual_value is either the received events or an UnorderedMatcher
+        that was fed while consuming. Only a reference to the matcher is
+        kept, the diff is made when a failure is reported.
+        """
         self.called = True
-        self.diff = DeepDiff(
-            self.expected,
-            actual_value,
-            ignore_order=True,
-            report_repetition=True,
-            verbose_level=2,
-        )
-        self.result = self.diff == {}
+        if isinstance(actual_value, UnorderedMatcher):
+            matcher = actual_value
+        else:
+            matcher = UnorderedMatcher(as_list(self.expected))
+            for value in as_list(actual_value):
+                matcher.feed(value)
+        self.matcher = matcher
+        self.actual = f"{matcher.received} events, {matcher.unexpected} unexpected"
+        self.result = matcher.passed()
         return self.result
 
+    @property
+    def diff(self):
+        # DeepDiff only runs on what was left unmatched
+        if self._diff is None and self.called and not self.result:
+            self._diff = DeepDiff(
+                self.matcher.missing(),
+                self.matcher.unexpected_sample,
+                ignore_order=True,
+                report_repetition=True,
+                verbose_level=2,
+            )
+        return self._diff
+
     def __str__(self):
         if self.passed():
-            return super().__str__()
+            return f"assertion passed, got {self.actual}"
         else:
             return (
-                f"assertion failed (unordered json comparison"
-                f"got: {self.expected}"
-                f"diff: {self.diff}"
+                f"assertion failed (unordered json comparison), "
+                f"got: {self.actual}, "
+                f"diff: {shorten(self.diff, MAX_DIFF_LENGTH)} "
                 f"See https://github.com/seperman/deepdiff for more info on how to read the diff"
             )
 
 
+class MatcherCall(AssertionCall):
+    """
+    Takes a matcher from pyrandall.matchers that was fed while
+    consuming as the actual value.
+    """
+
+    def __init__(self, expected_value):
+        super().__init__(expected_value)
+        self.matcher = None
+
+    def eval(self, actual_value):
+        self.called = True
+        self.matcher = actual_value
+        self.actual = actual_value.summary()
+        self.result = actual_value.passed()
+        return self.result
+
+    def __str__(self):
+        if self.passed():
+            return f"assertion passed, got {self.actual}"
+        else:
+            return f"assertion failed, {shorten(self.matcher.failure(), MAX_DIFF_LENGTH)}"
+
+
+# longest representation of a value or diff printed in the report
+MAX_VALUE_LENGTH = 200
+MAX_DIFF_LENGTH = 2000
+
+
+def shorten(value, limit=MAX_VALUE_LENGTH):
+    if isinstance(value, (bytes, str)) and len(value) > limit:
+        return f"{value[:limit]!r}... ({len(value)} long)"
+    text = str(value)
+    if len(text) > limit:
+        return f"{text[:limit]}... ({len(text)} long)"
+    return text
+
+
+def as_list(value):
+    if isinstance(value, (list, tuple)):
+        return value
+    return [value]
+
+
 def json_deep_equals(expected, actual):
     result = jsondiff.diff(expected, actual)
     return result == {}
@@ -167,6 +244,35 @@ class SkipAssertionCall(AssertionCall):
 # - field assertions is present
 
 
+class PollPolicy(NamedTuple):
+    # seconds until the last attempt
+    timeout: float
+    interval: float = 0.5
+    backoff: float = 1.5
+    max_interval: float = 5.0
+    jitter: float = 0.1
+
+    def delays(self):
+        # seconds to wait before each next attempt
+        interval = self.interval
+        while True:
+            yield interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            interval = min(interval * self.backoff, self.max_interval)
+
+
+class FileBody(NamedTuple):
+    """
+    A request body sent from disk, the file is opened when the request
+    goes out instead of being held in memory for the whole run.
+    """
+
+    path: str
+    size: int
+
+    def open(self):
+        return open(self.path, "rb")
+
+
 class RequestHttpSpec(NamedTuple):
     execution_mode: ExecutionMode
     # general request options
@@ -174,18 +280,29 @@ class RequestHttpSpec(NamedTuple):
     url: str
     headers: Dict[str, str]
     # simulate fields
+    # a FileBody for event files of at least stream_body_size
     body: bytes = None
     # TODO: remove all events from here
     events: List[str] = []
+    # stamp a correlation id header (see pyrandall.correlation)
+    stamp_correlation_id: bool = False
     # validate fields
     # assert_that_responded translated to fields
     assertions: Dict[str, Any] = {}
     adapter: Adapter = Adapter.REQUESTS_HTTP
+    # send again until the assertions pass, None sends once
+    poll: PollPolicy = None
 
 
 class RequestEventsSpec(NamedTuple):
     # general request options
     requests: List[RequestHttpSpec]
+    # requests sent concurrently, None takes it from the config
+    max_in_flight: int = None
+    # open-model load, the requests are cycled and sent at rate_per_sec
+    # for duration seconds regardless of response times
+    rate_per_sec: float = None
+    duration: float = None
     execution_mode = ExecutionMode.SIMULATING
     adapter: Adapter = Adapter.REQUESTS_HTTP
 
@@ -196,10 +313,18 @@ class BrokerKafkaSpec(NamedTuple):
     topic: str
     # simulate fields
     events: List[str] = []
+    # load generation, events are cycled until produce_total are sent
+    # paced at rate_per_sec (None sends once, as fast as possible)
+    produce_total: int = None
+    rate_per_sec: float = None
+    # stamp a correlation id header (see pyrandall.correlation)
+    stamp_correlation_id: bool = False
     # validate fields
     # assert_that_responded translated to fields
     assertions: Dict[str, Any] = {}
     adapter: Adapter = Adapter.BROKER_KAFKA
+    # "group" or "simulate_start" (see pyrandall.kafka.ConsumerRegistry)
+    consume_from: str = "group"
 
 
 __all__ = [
@@ -208,7 +333,11 @@ __all__ = [
     "Flags",
     "Assertion",
     "AssertionCall",
+    "MatcherAssertion",
+    "MatcherCall",
     "SkipAssertionCall",
+    "PollPolicy",
+    "FileBody",
     "RequestHttpSpec",
     "RequestEventsSpec",
     "BrokerKafkaSpec",
@@ -28,5 +28,6 @@ setup(
         "pluggy~=0.13.0",
         "Click~=7.0"
     ],
+    extras_require={"async": ["aiohttp~=3.8"]},
     tests_require=["pytest", "pytest_httpserver", "responses", "vcrpy", "freezegun"],
 )
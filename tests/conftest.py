@@ -33,6 +33,14 @@ def vcr(request):
         path_transformer=VCR.ensure_suffix(".yaml"),
     )
 
+
+@pytest.fixture
+def httpserver(httpserver):
+    # the server is shared by all tests, start each one without handlers and log
+    httpserver.clear()
+    return httpserver
+
+
 # Internal Class Mocks, Stubs etc.
 
 @pytest.fixture
@@ -1,9 +1,9 @@
 import pytest
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from pyrandall.reporter import ResultSet
-from pyrandall.types import UnorderedCompare
+from pyrandall.types import AssertionCall, UnorderedCompare
 
 
 @pytest.fixture
@@ -33,3 +33,29 @@ def test_two_fields_not_equals(resultset):
 
     obj = UnorderedCompare(a)
     assert obj.eval(b) is False
+
+
+@patch("pyrandall.types.DeepDiff")
+def test_diff_only_made_when_failure_is_reported(deepdiff):
+    obj = UnorderedCompare([b'{"a": 1}'])
+    assert obj.eval([b'{"a": 2}']) is False
+    deepdiff.assert_not_called()
+
+    assert "assertion failed" in str(obj)
+    deepdiff.assert_called_once()
+
+
+@patch("pyrandall.types.DeepDiff")
+def test_no_diff_when_passed(deepdiff):
+    obj = UnorderedCompare([b'{"a": 1}'])
+    assert obj.eval([b'{"a": 1}'])
+    assert str(obj) == "assertion passed, got 1 events, 0 unexpected"
+    deepdiff.assert_not_called()
+
+
+def test_large_values_are_shortened():
+    a = AssertionCall(b"x" * 10000)
+    a.actual_value = b"y"
+    text = str(a)
+    assert len(text) < 300
+    assert "(10000 long)" in text
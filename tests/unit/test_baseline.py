@@ -0,0 +1,74 @@
+import pytest
+
+from pyrandall.baseline import Baseline, Regression, collect
+
+
+@pytest.fixture
+def current():
+    return {
+        "Send clicks": {"wall_time": {"seconds": 2.0}},
+        "Send clicks > simulate > BrokerKafka simulating to foo": {
+            "produce": {"delivered": 100, "rate_per_sec": 800.0, "p99_ms": 40.0},
+            "wall_time": {"seconds": 1.0},
+        },
+    }
+
+
+def test_collect_keys_tasks_by_scenario_and_phase():
+    scenarios = [{"scenario": "Send clicks", "seconds": 2.0}]
+    task = {"scenario": "Send clicks", "phase": "validate", "task": "BrokerKafka validating foo"}
+    tasks = [dict(task, metrics={"a": {}}), dict(task, metrics={"b": {}})]
+    assert collect(scenarios, tasks) == {
+        "Send clicks": {"wall_time": {"seconds": 2.0}},
+        "Send clicks > validate > BrokerKafka validating foo": {"a": {}},
+        "Send clicks > validate > BrokerKafka validating foo #2": {"b": {}},
+    }
+
+
+def test_save_and_compare_without_regressions(tmp_path, current):
+    path = str(tmp_path / "baseline.json")
+    Baseline(save_path=path).save(current)
+    baseline = Baseline(compare_path=path, tolerance=0.2)
+    # within tolerance, or better
+    current["Send clicks"]["wall_time"]["seconds"] = 2.3
+    current["Send clicks > simulate > BrokerKafka simulating to foo"]["produce"]["rate_per_sec"] = 900.0
+    assert baseline.compare(baseline.load(), current) == []
+
+
+def test_compare_flags_slower_tasks(current):
+    baseline = Baseline(tolerance=0.2)
+    previous = {
+        "Send clicks": {"wall_time": {"seconds": 1.0}},
+        "Send clicks > simulate > BrokerKafka simulating to foo": {
+            "produce": {"delivered": 10, "rate_per_sec": 1200.0, "p99_ms": 38.0},
+        },
+    }
+    assert baseline.compare(previous, current) == [
+        Regression("Send clicks", "wall_time", "seconds", 1.0, 2.0),
+        Regression(
+            "Send clicks > simulate > BrokerKafka simulating to foo",
+            "produce",
+            "rate_per_sec",
+            1200.0,
+            800.0,
+        ),
+    ]
+
+
+def test_compare_ignores_noise():
+    baseline = Baseline(tolerance=0.2)
+    previous = {"t": {"http": {"p50_ms": 2.0}}}
+    assert baseline.compare(previous, {"t": {"http": {"p50_ms": 4.0}}}) == []
+
+
+def test_compare_flags_open_model_rate():
+    baseline = Baseline(tolerance=0.2)
+    previous = {"t": {"open_model": {"achieved_per_sec": 50.0}}}
+    current = {"t": {"open_model": {"achieved_per_sec": 30.0}}}
+    assert baseline.compare(previous, current) == [
+        Regression("t", "open_model", "achieved_per_sec", 50.0, 30.0)
+    ]
+
+
+def test_load_missing_baseline(tmp_path):
+    assert Baseline(compare_path=str(tmp_path / "missing.json")).load() is None
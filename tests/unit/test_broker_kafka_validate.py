@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 import pytest
 
 from pyrandall.executors import BrokerKafka
+from pyrandall.kafka import Record
 from pyrandall.reporter import Reporter
 from pyrandall.spec import BrokerKafkaSpec
 from pyrandall.types import Assertion, ExecutionMode
@@ -45,11 +46,9 @@ def test_validate_fail_zero_messages(_consume, _check, reporter_1):
 @mock.patch("pyrandall.executors.broker_kafka.KafkaConn.consume")
 def test_validate_fail_one_messages_body(consume, _check, reporter_1):
     # given a value that is empty json
-    consume.return_value = [{"value": b"{}"}]
+    consume.return_value = [Record(b"{}")]
     # and a assertion on a full example json
-    validator = new_executor(
-        {"total_events": 1, "unordered": [{"value": MESSAGE_JSON}]}
-    )
+    validator = new_executor({"total_events": 1, "unordered": [MESSAGE_JSON]})
     validator.execute(reporter_1)
     reporter_1.assertion_passed.assert_called_with(mock.ANY)
     # then validate fails
@@ -60,7 +59,7 @@ def test_validate_fail_one_messages_body(consume, _check, reporter_1):
 @mock.patch("pyrandall.executors.broker_kafka.KafkaConn.consume")
 def test_validate_matches_all(consume, _check, reporter_1):
     # given a message with bytes json
-    consume.return_value = [MESSAGE_JSON]
+    consume.return_value = [Record(MESSAGE_JSON)]
     # and validators that asserts 1 message and 1 message value
     validator = new_executor(
         {"total_events": 1, "unordered": [MESSAGE_JSON]}
@@ -71,3 +70,20 @@ def test_validate_matches_all(consume, _check, reporter_1):
     assert (
         2 == reporter_1.assertion_passed.call_count
     ), 'expected method "assertion_passed(ANY)" to be called twice'
+    # assertions the spec does not use are not reported as skipped
+    reporter_1.assertion_skipped.assert_not_called()
+
+
+@mock.patch("pyrandall.executors.broker_kafka.KafkaConn.check_connection", return_value=True)
+@mock.patch("pyrandall.executors.broker_kafka.KafkaConn.consume")
+def test_validate_ordered_and_last_event(consume, _check, reporter_1):
+    consume.return_value = [Record(b'{"click": "one"}'), Record(b'{"click": "two"}')]
+    validator = new_executor(
+        {
+            "ordered": [b'{ "click": "two" }', b'{ "click": "one" }'],
+            "last_event": b'{ "click": "two" }',
+        }
+    )
+    validator.execute(reporter_1)
+    reporter_1.assertion_failed.assert_called_once_with(mock.ANY, "ordered events")
+    reporter_1.assertion_passed.assert_called_once_with(mock.ANY)
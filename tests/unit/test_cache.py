@@ -0,0 +1,31 @@
+import os
+
+from pyrandall.cache import FileCache
+
+
+def test_builds_once_per_file(tmp_path):
+    path = tmp_path / "event.json"
+    path.write_text("{}")
+    cache = FileCache()
+    built = []
+
+    def build():
+        built.append(1)
+        return len(built)
+
+    assert cache.get(str(path), build) == 1
+    assert cache.get(str(path), build) == 1
+    # extra key parts are cached separately
+    assert cache.get(str(path), build, "kafka") == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_rebuilds_modified_file(tmp_path):
+    path = tmp_path / "event.json"
+    path.write_text("{}")
+    cache = FileCache()
+    assert cache.get(str(path), lambda: "first") == "first"
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert cache.get(str(path), lambda: "second") == "second"
@@ -2,7 +2,10 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from pyrandall.baseline import Baseline
 from pyrandall.commander import Commander, Flags
+from pyrandall.executors import AsyncRequestHttpEvents
+from pyrandall.executors.requests_http import OPEN_MODEL_IN_FLIGHT
 from pyrandall.reporter import Reporter, ResultSet
 from pyrandall.spec import SpecBuilder
 
@@ -35,3 +38,45 @@ def test_commander_run_one_for_one(spec, vcr):
         reporter.print_failures.assert_called_once_with()
         reporter.passed.assert_called_once()
         assert len(cassette) == 2
+
+
+def test_commander_fails_on_baseline_regression(spec, tmp_path):
+    path = str(tmp_path / "baseline.json")
+    Baseline(save_path=path).save(
+        {"Send words1 event": {"wall_time": {"seconds": 0.0}}}
+    )
+    reporter = MagicMock(Reporter(), unsafe=True)
+    reporter.scenarios = [{"scenario": "Send words1 event", "seconds": 1.0}]
+    reporter.tasks = []
+    reporter.passed.return_value = True
+
+    c = Commander(spec, Flags.E2E, baseline=Baseline(compare_path=path))
+    c.run_scenarios = MagicMock()
+    assert not c.run(reporter)
+    (regressions, _tolerance), _ = reporter.print_regressions.call_args
+    assert [r.metric for r in regressions] == ["seconds"]
+
+
+def test_commander_asyncio_engine(spec):
+    pytest.importorskip("aiohttp")
+    c = Commander(spec, Flags.E2E, requests_config={"engine": "asyncio"})
+    simulate = spec.scenario_items[0].simulate_tasks[0]
+    assert isinstance(c.executor_factory(simulate), AsyncRequestHttpEvents)
+    c.async_engine.close()
+
+
+def test_commander_pools_a_connection_per_request_in_flight(spec):
+    tasks = spec.scenario_items[0].simulate_tasks
+    tasks[0] = tasks[0]._replace(max_in_flight=30)
+    c = Commander(spec, Flags.E2E, requests_config={"max_in_flight": 4})
+    assert c.max_in_flight() == 30
+    assert c.session.get_adapter("http://localhost:5000")._pool_maxsize == 30
+    c.session.close()
+
+
+def test_commander_pools_connections_for_open_model(spec):
+    tasks = spec.scenario_items[0].simulate_tasks
+    tasks[0] = tasks[0]._replace(rate_per_sec=100, duration=1.0)
+    c = Commander(spec, Flags.E2E)
+    assert c.max_in_flight() == OPEN_MODEL_IN_FLIGHT
+    c.session.close()
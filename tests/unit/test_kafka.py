@@ -0,0 +1,315 @@
+import time
+from unittest.mock import ANY, MagicMock, patch
+
+import pytest
+
+from confluent_kafka import TIMESTAMP_CREATE_TIME, KafkaException
+
+from pyrandall.kafka import (
+    CHECK_TIMEOUT,
+    ConsumeListener,
+    ConsumerRegistry,
+    ConsumerState,
+    KafkaConn,
+    KafkaSetupError,
+    ProducerPool,
+    Record,
+    SharedConsumer,
+)
+
+
+class FakeProducer:
+    """
+    calls the delivery callback on poll / flush like librdkafka does,
+    every message in `failing` is reported with an error
+    """
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.pending = []
+        self.flush_count = 0
+
+    def produce(self, topic, msg, key=None, callback=None):
+        self.pending.append((msg, callback))
+
+    def poll(self, timeout=None):
+        pending, self.pending = self.pending, []
+        for msg, callback in pending:
+            error = MagicMock() if msg in self.failing else None
+            callback(error, MagicMock())
+        return len(pending)
+
+    def flush(self, timeout=None):
+        self.flush_count += 1
+        self.poll()
+        return 0
+
+    def __len__(self):
+        return len(self.pending)
+
+
+@pytest.fixture
+def kafka():
+    conn = KafkaConn()
+    conn.producer = FakeProducer(failing=[b"2"])
+    return conn
+
+
+def test_produce_messages_counts_deliveries(kafka):
+    report = kafka.produce_messages("foo", [b"1", b"2", b"3"])
+    assert report.delivered == 2
+    assert report.failed == 1
+    assert len(report.latency) == 3
+
+
+def test_produce_messages_retries_full_queue(kafka):
+    kafka.producer.produce = MagicMock(side_effect=[BufferError(), None])
+    report = kafka.produce_messages("foo", [b"1"])
+    assert report.retried == 1
+    assert kafka.producer.produce.call_count == 2
+
+
+def test_produce_messages_flushes_once(kafka):
+    kafka.produce_messages("foo", [b"1", b"3", b"4"])
+    assert kafka.producer.flush_count == 1
+
+
+def test_produce_messages_cycles_until_total(kafka):
+    report = kafka.produce_messages("foo", [b"1", b"3"], total=5)
+    assert report.sent == 5
+    assert report.delivered == 5
+
+
+def test_produce_messages_prints_progress_per_hundred(kafka, capsys):
+    kafka.produce_messages("foo", [b"1"], total=250)
+    assert capsys.readouterr().out == ".."
+
+
+def test_produce_messages_paced_at_rate(kafka):
+    report = kafka.produce_messages("foo", [b"1"], total=5, rate_per_sec=50)
+    # the last send is scheduled at 4 intervals of 20ms
+    assert report.elapsed >= 0.08
+    assert report.rate_per_sec() <= 62.5
+
+
+@patch("pyrandall.kafka.Producer")
+def test_producer_pool_reuses_per_config(producer):
+    producer.side_effect = lambda config: MagicMock()
+    check = MagicMock()
+    pool = ProducerPool()
+    p1 = pool.acquire({"bootstrap.servers": "kafka:9092"}, check)
+    p2 = pool.acquire({"bootstrap.servers": "kafka:9092"}, check)
+    p3 = pool.acquire({"bootstrap.servers": "other:9092"}, check)
+
+    assert p1 is p2
+    assert p1 is not p3
+    assert producer.call_count == 2
+    # connection is only checked when a producer is created
+    assert check.call_count == 2
+    assert pool.stats() == [
+        {"bootstrap.servers": "kafka:9092", "created": 1, "reused": 1},
+        {"bootstrap.servers": "other:9092", "created": 1, "reused": 0},
+    ]
+
+
+@patch("pyrandall.kafka.Producer")
+def test_producer_pool_close_flushes(producer):
+    pool = ProducerPool()
+    p1 = pool.acquire({"bootstrap.servers": "kafka:9092"})
+    pool.close()
+    p1.flush.assert_called_once_with()
+    assert pool.producers == {}
+
+
+def test_check_connection_times_out_undelivered():
+    producer = MagicMock()
+    # one message left undelivered after the flush
+    producer.flush.return_value = 1
+    with pytest.raises(KafkaSetupError):
+        KafkaConn().check_connection(producer)
+    producer.flush.assert_called_once_with(CHECK_TIMEOUT)
+
+
+@patch("pyrandall.kafka.Producer")
+def test_check_connection_uses_pooled_producer(producer):
+    producer.return_value.flush.return_value = 0
+    pool = ProducerPool()
+    KafkaConn(producers=pool).check_connection()
+    KafkaConn(producers=pool).check_connection()
+    # one producer, checked once, not counted as acquired
+    assert producer.call_count == 1
+    producer.return_value.produce.assert_called_once()
+    assert pool.stats()[0]["reused"] == 0
+
+
+@patch("pyrandall.kafka.Consumer")
+def test_assign_at_high_watermarks_missing_topic(consumer_cls):
+    consumer = consumer_cls.return_value
+    consumer.list_topics.return_value.topics = {}
+
+    kafka = KafkaConn()
+    kafka.assign_at_high_watermarks("foo")
+
+    consumer.assign.assert_not_called()
+    assert kafka.consume_lock == ConsumerState.PARTITIONS_UNASSIGNED
+
+
+@patch("pyrandall.kafka.Consumer")
+def test_assign_at_high_watermarks_metadata_timeout(consumer_cls):
+    consumer = consumer_cls.return_value
+    consumer.list_topics.side_effect = KafkaException("timed out")
+
+    kafka = KafkaConn()
+    kafka.assign_at_high_watermarks("foo")
+
+    consumer.assign.assert_not_called()
+    # the task consumes nothing and its assertions fail
+    assert list(kafka.consume("foo", 0.1)) == []
+
+
+@patch("pyrandall.kafka.KafkaConn.subscribe_ahead")
+@patch("pyrandall.kafka.KafkaConn.check_connection")
+def test_consumer_registry_one_consumer_per_topic(_check, subscribe_ahead):
+    registry = ConsumerRegistry()
+    s1 = registry.subscribe_ahead("foo", MagicMock())
+    s2 = registry.subscribe_ahead("foo", MagicMock())
+    s3 = registry.subscribe_ahead("bar", MagicMock())
+    assert subscribe_ahead.call_count == 2
+    assert s1 is s2
+    assert s1 is not s3
+    assert len(s1.listeners) == 2
+
+
+@patch("pyrandall.kafka.KafkaConn.assign_at_high_watermarks")
+@patch("pyrandall.kafka.KafkaConn.subscribe_ahead")
+@patch("pyrandall.kafka.KafkaConn.check_connection")
+def test_consumer_registry_assigns_at_simulate_start(_check, subscribe_ahead, assign):
+    registry = ConsumerRegistry(snapshot_offsets=True)
+    registry.subscribe_ahead("foo", MagicMock(), "simulate_start")
+    assign.assert_called_once_with("foo")
+    subscribe_ahead.assert_not_called()
+
+
+@patch("pyrandall.kafka.KafkaConn.assign_at_high_watermarks")
+@patch("pyrandall.kafka.KafkaConn.subscribe_ahead")
+@patch("pyrandall.kafka.KafkaConn.check_connection")
+def test_consumer_registry_validate_only_uses_group(_check, subscribe_ahead, assign):
+    registry = ConsumerRegistry(snapshot_offsets=False)
+    registry.subscribe_ahead("foo", MagicMock(), "simulate_start")
+    assign.assert_not_called()
+    subscribe_ahead.assert_called_once_with("foo")
+
+
+@patch("pyrandall.kafka.Consumer")
+def test_assign_at_high_watermarks(consumer_cls):
+    consumer = consumer_cls.return_value
+    consumer.list_topics.return_value.topics = {
+        "foo": MagicMock(partitions={0: None, 1: None}, error=None)
+    }
+    consumer.get_watermark_offsets.side_effect = [(0, 10), (3, 7)]
+
+    kafka = KafkaConn()
+    kafka.assign_at_high_watermarks("foo")
+
+    consumer.subscribe.assert_not_called()
+    (partitions,), _ = consumer.assign.call_args
+    assert [(p.partition, p.offset) for p in partitions] == [(0, 10), (1, 7)]
+
+
+@patch("pyrandall.kafka.KafkaConn.subscribe_ahead")
+@patch("pyrandall.kafka.KafkaConn.check_connection")
+def test_consumer_registry_validate_only_shares_group_consumer(_check, subscribe_ahead):
+    registry = ConsumerRegistry(snapshot_offsets=False)
+    s1 = registry.subscribe_ahead("foo", MagicMock(), "group")
+    s2 = registry.subscribe_ahead("foo", MagicMock(), "simulate_start")
+    # both use the consumer group, a second consumer would split the partitions
+    assert s1 is s2
+    subscribe_ahead.assert_called_once_with("foo")
+
+
+@patch("pyrandall.kafka.KafkaConn.consume_into")
+@patch("pyrandall.kafka.KafkaConn.subscribe_ahead")
+@patch("pyrandall.kafka.KafkaConn.check_connection")
+def test_consumer_registry_new_consumer_per_scenario(_check, subscribe_ahead, consume_into):
+    registry = ConsumerRegistry(snapshot_offsets=False)
+    # scenario 1 validates the topic
+    s1 = registry.subscribe_ahead("foo", MagicMock())
+    s1.consume()
+    # scenario 2 validates the same topic again
+    s2 = registry.subscribe_ahead("foo", MagicMock())
+    s2.consume()
+    assert s1 is not s2
+    assert subscribe_ahead.call_count == 2
+    assert consume_into.call_count == 2
+
+
+def assigned_consumer(batches):
+    def consume(timeout):
+        if batches:
+            return batches.pop(0)
+        time.sleep(timeout)
+        return []
+
+    kafka = KafkaConn()
+    kafka.consumer = MagicMock()
+    kafka.consumer.consume.side_effect = consume
+    kafka.buffered = []
+    kafka.consume_lock = ConsumerState.PARTITIONS_ASSIGNED
+    return kafka
+
+
+def message(value, headers=None, timestamp_ms=1000):
+    msg = MagicMock()
+    msg.value.return_value = value
+    msg.headers.return_value = headers
+    msg.timestamp.return_value = (TIMESTAMP_CREATE_TIME, timestamp_ms)
+    return msg
+
+
+def test_consume_stops_when_satisfied():
+    kafka = assigned_consumer([[message(b"1")], [message(b"2")], [message(b"3")]])
+    events = []
+    for record in kafka.consume("foo", 60.0, until=lambda: len(events) == 2):
+        events.append(record.value)
+    assert events == [b"1", b"2"]
+    assert kafka.consumer is None
+
+
+def test_consume_grace_period_catches_extra_events():
+    kafka = assigned_consumer([[message(b"1")], [message(b"2")]])
+    events = []
+    for record in kafka.consume("foo", 60.0, until=lambda: len(events) == 1, grace_period=0.5):
+        events.append(record.value)
+    assert events == [b"1", b"2"]
+
+
+def test_shared_consumer_fans_out_once():
+    kafka = assigned_consumer([[message(b"1")], [message(b"2")]])
+    shared = SharedConsumer("foo", kafka)
+    e1, e2 = [], []
+    l1 = ConsumeListener(60.0, on_event=e1.append, until=lambda: len(e1) == 1)
+    l2 = ConsumeListener(60.0, on_event=e2.append, until=lambda: len(e2) == 2)
+    shared.listeners += [l1, l2]
+
+    shared.consume()
+    shared.consume()
+
+    # the first listener is done after one event, the other keeps reading
+    assert [r.value for r in e1] == [b"1"]
+    assert [r.value for r in e2] == [b"1", b"2"]
+    assert kafka.consumer is None
+
+
+def test_record_from_message():
+    record = Record.from_message(
+        message(b"1", headers=[("pyrandall-correlation-id", b"abc")], timestamp_ms=1500)
+    )
+    assert record == Record(b"1", {"pyrandall-correlation-id": b"abc"}, 1.5)
+
+
+def test_produce_messages_stamps_headers(kafka):
+    kafka.producer.produce = MagicMock()
+    kafka.produce_messages("foo", [b"1"], stamp=lambda: {"h": "v"})
+    kafka.producer.produce.assert_called_once_with(
+        "foo", b"1", callback=ANY, headers={"h": "v"}
+    )
@@ -0,0 +1,249 @@
+import pytest
+
+from pyrandall.correlation import Correlations
+from pyrandall.kafka import Record
+from pyrandall.matchers import (
+    ExpectedEvent,
+    FirstEventMatcher,
+    LastEventMatcher,
+    LatencyMatcher,
+    OrderedMatcher,
+    ReceivedEvents,
+    Subset,
+    ThroughputMatcher,
+    SubsetMatcher,
+    UnorderedMatcher,
+    canonical,
+    digest,
+)
+
+
+def test_unordered_matcher_in_any_order():
+    m = UnorderedMatcher([b"1", b"2", b"2"])
+    for value in [b"2", b"1", b"2"]:
+        m.feed(value)
+    assert m.passed()
+    assert m.unmatched == {}
+
+
+def test_unordered_matcher_counts_unexpected():
+    m = UnorderedMatcher([b"1"])
+    for value in [b"1", b"1", b"3"]:
+        m.feed(value)
+    assert m.satisfied()
+    assert not m.passed()
+    assert m.unexpected == 2
+    assert m.unexpected_sample == [b"1", b"3"]
+
+
+def test_unordered_matcher_missing():
+    m = UnorderedMatcher([{"a": 1}, {"a": 1}, {"b": [2]}])
+    m.feed({"a": 1})
+    assert not m.satisfied()
+    assert m.missing() == [{"a": 1}, {"b": [2]}]
+
+
+def test_received_satisfied_by_total_events():
+    received = ReceivedEvents({"total_events": 2})
+    received.feed(b"1")
+    assert not received.satisfied()
+    received.feed(b"2")
+    assert received.satisfied()
+
+
+def test_received_satisfied_by_unordered():
+    received = ReceivedEvents({"total_events": 1, "unordered": [b"1"]})
+    received.feed(b"{}")
+    assert not received.satisfied()
+    received = ReceivedEvents({"total_events": 1, "unordered": [b"1"]})
+    received.feed(b"1")
+    assert received.satisfied()
+
+
+def test_received_never_satisfied_when_expecting_empty():
+    assert not ReceivedEvents({"total_events": 0}).satisfied()
+    assert not ReceivedEvents({}).satisfied()
+
+
+def test_canonical_json_ignores_formatting():
+    pretty = b'{\n  "b": 1.0,\n  "a": "x"\n}\n'
+    assert canonical(pretty) == b'{"a":"x","b":1}'
+    assert canonical({"a": "x", "b": 1}) == canonical(pretty)
+
+
+def test_canonical_non_json_as_is():
+    assert canonical(b"foo bar") == b"foo bar"
+    assert canonical("foo bar") == b"foo bar"
+
+
+def test_unordered_matcher_compares_canonical_json():
+    m = UnorderedMatcher([b'{ "click": "one" }\n', b'{\n  "click": "two"\n}\n'])
+    m.feed(b'{"click": "two"}')
+    m.feed(b'{"click": "one"}')
+    assert m.passed()
+
+
+def test_expected_event_compares_as_bytes():
+    event = ExpectedEvent(b'{ "id": "bar" }\n')
+    assert event == b'{ "id": "bar" }\n'
+    assert event.parsed == {"id": "bar"}
+    assert event.canonical == b'{"id":"bar"}'
+    assert digest(event) == digest(b'{"id": "bar"}')
+
+
+def test_ordered_matcher_in_order():
+    m = OrderedMatcher([b"1", b"2"])
+    m.feed(b"1")
+    assert not m.satisfied()
+    m.feed(b"2")
+    assert m.passed()
+
+
+def test_ordered_matcher_keeps_first_mismatch():
+    m = OrderedMatcher([b"1", b"2"])
+    for value in [b"2", b"1", b"3"]:
+        m.feed(value)
+    assert not m.passed()
+    assert m.mismatch == (0, b"1", b"2")
+    assert m.failure() == "event 0 expected b'1', but got b'2'"
+
+
+def test_ordered_matcher_fails_on_extra_event():
+    m = OrderedMatcher([b"1"])
+    m.feed(b"1")
+    m.feed(b"1")
+    assert not m.passed()
+
+
+def test_first_and_last_event_matchers():
+    first = FirstEventMatcher(b'{"a": 1}')
+    last = LastEventMatcher(b'{"a": 3}')
+    for value in [b'{"a":1}', b'{"a":2}', b'{"a":3}']:
+        first.feed(value)
+        last.feed(value)
+    assert first.passed()
+    assert last.passed()
+    assert last.event == b'{"a":3}'
+
+
+def test_last_event_satisfied_only_with_total_events():
+    received = ReceivedEvents({"last_event": b"1"})
+    received.feed(b"1")
+    assert not received.satisfied()
+
+    received = ReceivedEvents({"total_events": 1, "last_event": b"1"})
+    received.feed(b"1")
+    assert received.satisfied()
+
+
+def test_subset_ignores_other_fields():
+    subset = Subset.compile({"click": "one", "user": {"id": 1}}, name="clicks/1.json")
+    assert subset({"click": "one", "user": {"id": 1.0, "name": "x"}, "ts": 123})
+    assert not subset({"click": "one", "user": {"name": "x"}})
+    assert str(subset) == "clicks/1.json"
+
+
+def test_subset_dotted_fields():
+    subset = Subset.compile(fields={"items.1.name": "book", "user.id": 42})
+    assert subset({"items": [{}, {"name": "book"}], "user": {"id": 42}})
+    assert not subset({"items": [{"name": "book"}], "user": {"id": 42}})
+    assert not subset([1, 2])
+
+
+def test_subset_matcher_parses_once_per_event():
+    matcher = SubsetMatcher(
+        [Subset.compile(fields={"click": "one"}), Subset.compile(fields={"click": "one"})]
+    )
+    for value in [b'{"click": "one", "ts": 1}', b"not json", b'{"click": "one", "ts": 2}']:
+        matcher.feed(value)
+    assert matcher.satisfied()
+    assert not matcher.passed()
+    assert matcher.unexpected_sample == [b"not json"]
+    assert matcher.summary() == "2 of 2 subsets matched by 3 events"
+
+
+def test_subset_matcher_reassigns_events():
+    matcher = SubsetMatcher(
+        [Subset.compile(fields={"a": 1}), Subset.compile(fields={"a": 1, "b": 2})]
+    )
+    # the first event fits both subsets, the second only the less specific one
+    matcher.feed(b'{"a": 1, "b": 2}')
+    matcher.feed(b'{"a": 1}')
+    assert matcher.passed()
+    matcher.feed(b'{"a": 1}')
+    assert matcher.unexpected == 1
+
+
+def test_subset_matcher_reassigns_between_specific_subsets():
+    matcher = SubsetMatcher(
+        [Subset.compile(fields={"a": 1, "b": 2}), Subset.compile(fields={"a": 1, "c": 3})]
+    )
+    matcher.feed(b'{"a": 1, "b": 2, "c": 3}')
+    matcher.feed(b'{"a": 1, "b": 2}')
+    assert matcher.passed()
+
+
+def test_received_satisfied_by_subsets():
+    received = ReceivedEvents({"matches_subset": [Subset.compile(fields={"a": 1})]})
+    received.feed(b'{"a": 2}')
+    assert not received.satisfied()
+    received.feed(b'{"a": 1, "b": 2}')
+    assert received.satisfied()
+
+
+def test_received_latency_of_correlated_events():
+    correlations = Correlations()
+    headers = correlations.stamp()
+    sent_at = correlations.sent[headers["pyrandall-correlation-id"]]
+    received = ReceivedEvents({"latency_under": 0.5}, correlations)
+    correlation_id = headers["pyrandall-correlation-id"].encode()
+    received.receive(Record(b"1", {"pyrandall-correlation-id": correlation_id}, sent_at + 0.25))
+    received.receive(Record(b"2", {"pyrandall-correlation-id": b"other run"}, sent_at + 9))
+    assert received.total == 2
+    assert received.latency.passed()
+    assert received.latency.metrics() == {
+        "events": 1,
+        "p50_ms": 250.0,
+        "p95_ms": 250.0,
+        "p99_ms": 250.0,
+        "max_ms": 250.0,
+    }
+
+
+def test_latency_fails_without_correlated_events():
+    latency = LatencyMatcher(0.5)
+    assert not latency.passed()
+    assert latency.failure() == "no correlated events received"
+
+
+def test_throughput_over_the_whole_span():
+    throughput = ThroughputMatcher({"min_events_per_sec": 10})
+    for i in range(21):
+        throughput.record(100 + i * 0.1)
+    assert throughput.per_sec() == pytest.approx(10.5)
+    assert throughput.passed()
+
+
+def test_throughput_slowest_full_window():
+    throughput = ThroughputMatcher({"min_events_per_sec": 10, "window": 1.0})
+    # 20 events in the first second, a stall, 5 in the third and one in the last
+    timestamps = [100 + i * 0.05 for i in range(20)] + [102.1, 102.2, 102.3, 102.4, 102.5, 103.5]
+    for timestamp in reversed(timestamps):
+        throughput.record(timestamp)
+    assert throughput.per_sec() == 0.0
+    assert not throughput.passed()
+    assert throughput.summary() == "0.0 events/sec in the slowest of 2 windows of 1.0s"
+
+
+def test_throughput_needs_two_timestamps():
+    throughput = ThroughputMatcher({"min_events_per_sec": 1})
+    throughput.record(100)
+    assert throughput.per_sec() is None
+    assert not throughput.passed()
+
+
+def test_received_throughput_by_broker_timestamp():
+    received = ReceivedEvents({"throughput": {"min_events_per_sec": 1, "window": None}})
+    received.receive(Record(b"1", {}, 100.0))
+    received.receive(Record(b"2", {}, 101.0))
+    assert received.throughput.metrics() == {"events": 2, "per_sec": 2.0, "min_per_sec": 1}
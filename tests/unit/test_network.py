@@ -1,4 +1,16 @@
-from pyrandall.network import join_urlpath
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from pyrandall.network import (
+    HttpTimings,
+    RequestTiming,
+    create_session,
+    join_urlpath,
+    take_connect_time,
+)
 
 
 def test_urljoin_accepts_none():
@@ -23,3 +35,73 @@ def test_urljoin_avoids_double_slashes():
     url = "http://localhost.com/foo/"
     result = join_urlpath(url, "/bar")
     assert "http://localhost.com/foo/bar" == result
+
+
+def test_create_session_pools_per_host():
+    session = create_session({"pool_size": 4})
+    adapter = session.get_adapter("https://ingest.example.com")
+    assert adapter is session.get_adapter("http://other.example.com")
+    assert adapter._pool_connections == 4
+    assert adapter._pool_maxsize == 4
+    assert session.headers["Connection"] == "keep-alive"
+
+
+def test_create_session_without_keep_alive():
+    session = create_session({"keep_alive": False})
+    assert session.headers["Connection"] == "close"
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def keep_alive_url():
+    # the httpserver fixture closes every connection
+    server = ThreadingServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_records_connect_time_once(keep_alive_url):
+    session = create_session({})
+    take_connect_time()
+    session.get(keep_alive_url)
+    assert take_connect_time() > 0
+    # the second request reuses the pooled connection
+    session.get(keep_alive_url)
+    assert take_connect_time() is None
+    session.close()
+
+
+def test_http_timings_metrics():
+    timings = HttpTimings()
+    timings.record(RequestTiming(0.01, 0.02, 0.03, 100, 200, False))
+    timings.record(RequestTiming(None, 0.04, 0.05, 100, 300, True))
+    metrics = timings.metrics()
+    assert list(metrics) == ["http_connect", "http_ttfb", "http_total", "http"]
+    assert metrics["http_connect"]["p99_ms"] == 10.0
+    assert metrics["http_ttfb"]["min_ms"] == 20.0
+    assert metrics["http_total"]["mean_ms"] == 40.0
+    assert metrics["http"] == {
+        "requests": 2,
+        "reused": 1,
+        "request_bytes": 200,
+        "response_bytes": 500,
+    }
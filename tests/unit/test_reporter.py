@@ -1,8 +1,8 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call
 
 import pytest
 
-from pyrandall.reporter import Reporter
+from pyrandall.reporter import BufferedResultSet, Reporter, ResultSet
 from pyrandall.types import AssertionCall
 
 
@@ -76,3 +76,38 @@ def test_get_failures():
     assert 1 == len(failures)
     f1 = failures[0]
     assert "assertion failed, expected 1, but got 4" == str(f1)
+
+
+def test_metrics_recorded_on_task():
+    r = Reporter()
+    r.scenario("Send clicks")
+    r.simulate()
+    rs = r.create_and_track_resultset()
+    r.run_task("BrokerKafka simulating to foo")
+    rs.metrics("produce", {"delivered": 3, "p50_ms": 1.5})
+    r.task_time(0.1234)
+    assert r.tasks == [
+        {
+            "scenario": "Send clicks",
+            "phase": "simulate",
+            "task": "BrokerKafka simulating to foo",
+            "metrics": {
+                "produce": {"delivered": 3, "p50_ms": 1.5},
+                "wall_time": {"seconds": 0.123},
+            },
+        }
+    ]
+
+
+def test_buffered_resultset_replays_in_order():
+    buffer = BufferedResultSet()
+    buffer.assertion_passed("a")
+    buffer.metrics("http", {"elapsed_ms": 1.0})
+    buffer.assertion_failed("b", "status_code")
+    resultset = MagicMock(ResultSet)
+    buffer.replay(resultset)
+    assert resultset.method_calls == [
+        call.assertion_passed("a"),
+        call.metrics("http", {"elapsed_ms": 1.0}),
+        call.assertion_failed("b", "status_code"),
+    ]
@@ -0,0 +1,146 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+from werkzeug import Response
+
+from pyrandall.executors import AsyncEngine, AsyncRequestHttp, AsyncRequestHttpEvents
+from pyrandall.spec import RequestEventsSpec, RequestHttpSpec
+from pyrandall.types import ExecutionMode, FileBody
+
+# the asyncio engine is an optional dependency
+pytest.importorskip("aiohttp")
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncEngine({"timeout": 0.2})
+    yield engine
+    engine.close()
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def concurrency():
+    """url of a server that records the peak of requests handled at once"""
+    lock = threading.Lock()
+    seen = {"now": 0, "peak": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            with lock:
+                seen["now"] += 1
+                seen["peak"] = max(seen["peak"], seen["now"])
+            time.sleep(0.3)
+            with lock:
+                seen["now"] -= 1
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/events", seen
+    server.shutdown()
+    server.server_close()
+
+
+def request_spec(url, assertions):
+    return RequestHttpSpec(
+        execution_mode=ExecutionMode.SIMULATING,
+        assertions=assertions,
+        url=url,
+        body=b'{"foo": "bar"}',
+        method="POST",
+        headers={},
+    )
+
+
+def test_async_events_report_in_order(httpserver, engine, reporter):
+    specs = []
+    for i in range(6):
+        httpserver.expect_request(f"/users/{i}").respond_with_data(str(i), status=201)
+        url = httpserver.url_for(f"/users/{i}")
+        specs.append(request_spec(url, {"status_code": 201, "body": str(i).encode()}))
+    spec = RequestEventsSpec(requests=specs, max_in_flight=3)
+
+    assert AsyncRequestHttpEvents(spec, engine=engine).execute(reporter)
+    bodies = [
+        c[0][0].actual
+        for c in reporter.assertion_passed.call_args_list
+        if isinstance(c[0][0].actual, bytes)
+    ]
+    assert bodies == [b"0", b"1", b"2", b"3", b"4", b"5"]
+    label, metrics = reporter.metrics.call_args[0]
+    assert label == "http"
+    assert metrics["requests"] == 6
+    reported = dict(c[0] for c in reporter.metrics.call_args_list)
+    # the test server closes every connection
+    assert reported["http"]["reused"] == 0
+    assert reported["http_connect"]["min_ms"] >= 0
+    assert reported["http"]["response_bytes"] > 6
+    assert reported["http_ttfb"]["max_ms"] <= reported["http_total"]["max_ms"]
+
+
+def test_async_request_timeout_fails(httpserver, engine, reporter):
+    def slow(request):
+        time.sleep(0.5)
+        return Response("late", status=201)
+
+    httpserver.expect_request("/slow").respond_with_handler(slow)
+    executor = AsyncRequestHttp(
+        request_spec(httpserver.url_for("/slow"), {"status_code": 201}), engine=engine
+    )
+    assert not executor.execute(reporter)
+    assertion_call, fail_text = reporter.assertion_failed.call_args[0]
+    assert fail_text == "http response status_code"
+    assert assertion_call.actual.startswith("TimeoutError")
+    # let the server finish the late response before the next test
+    while not httpserver.log:
+        time.sleep(0.05)
+
+
+def test_async_open_model(httpserver, engine, reporter):
+    httpserver.expect_request("/events").respond_with_data(status=204)
+    request = request_spec(httpserver.url_for("/events"), {"status_code": 204})
+    spec = RequestEventsSpec(requests=[request], rate_per_sec=50, duration=0.2)
+
+    assert AsyncRequestHttpEvents(spec, engine=engine).execute(reporter)
+    label, metrics = reporter.metrics.call_args[0]
+    assert label == "open_model"
+    assert metrics["sent"] == 10
+    assert metrics["target_per_sec"] == 50
+    assert len(httpserver.log) == 10
+
+
+def test_async_streams_file_body(httpserver, engine, reporter, tmp_path):
+    path = tmp_path / "large.json"
+    path.write_bytes(b'{"foo": "bar"}')
+    httpserver.expect_request("/events", data=b'{"foo": "bar"}').respond_with_data(status=204)
+    spec = request_spec(httpserver.url_for("/events"), {"status_code": 204})
+    spec = spec._replace(body=FileBody(str(path), 14))
+    assert AsyncRequestHttp(spec, engine=engine).execute(reporter)
+
+
+def test_async_events_not_capped_by_the_connector(concurrency, reporter):
+    url, seen = concurrency
+    engine = AsyncEngine({"timeout": 5.0})
+    specs = [request_spec(url, {"status_code": 201}) for _ in range(30)]
+    spec = RequestEventsSpec(requests=specs, max_in_flight=30)
+    try:
+        assert AsyncRequestHttpEvents(spec, engine=engine).execute(reporter)
+    finally:
+        engine.close()
+    # bounded by max_in_flight only, a pool of 10 connections used to cap it
+    assert seen["peak"] > 10
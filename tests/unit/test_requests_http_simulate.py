@@ -1,10 +1,14 @@
+import time
 from unittest.mock import MagicMock
 
 import pytest
+from werkzeug import Response
 
+from pyrandall.correlation import Correlations
 from pyrandall.executors import RequestHttp, RequestHttpEvents
+from pyrandall.network import create_session
 from pyrandall.spec import RequestEventsSpec, RequestHttpSpec
-from pyrandall.types import Assertion, ExecutionMode
+from pyrandall.types import Assertion, ExecutionMode, FileBody
 
 
 STATUS_CODE_ASSERTION = {"status_code": 201}
@@ -117,3 +121,136 @@ def test_simulate_post_200_and_400(simulator_3, reporter, vcr):
             assert cassette.all_played
 
         assert not result
+
+
+def test_simulate_stamps_correlation_id(httpserver, reporter):
+    httpserver.expect_request("/users", method="POST").respond_with_data(status=201)
+    spec = RequestHttpSpec(
+        execution_mode=ExecutionMode.SIMULATING,
+        assertions=STATUS_CODE_ASSERTION,
+        url=httpserver.url_for("/users"),
+        body=b'{"foo": "bar"}',
+        method="POST",
+        headers={},
+        stamp_correlation_id=True,
+    )
+    correlations = Correlations()
+    assert RequestHttp(spec, correlations=correlations).execute(reporter)
+
+    (request, _response), = httpserver.log
+    correlation_id = request.headers["pyrandall-correlation-id"]
+    assert correlation_id in correlations.sent
+    assert int(request.headers["pyrandall-sent-at"]) > 0
+
+
+def test_simulate_events_share_the_session(httpserver, reporter):
+    httpserver.expect_request("/users", method="POST").respond_with_data(status=201)
+    request = RequestHttpSpec(
+        execution_mode=ExecutionMode.SIMULATING,
+        assertions=STATUS_CODE_ASSERTION,
+        url=httpserver.url_for("/users"),
+        body=b'{"foo": "bar"}',
+        method="POST",
+        headers={},
+    )
+    session = create_session()
+    session.request = MagicMock(wraps=session.request)
+    spec = RequestEventsSpec(requests=[request, request])
+    assert RequestHttpEvents(spec, session=session).execute(reporter)
+    assert session.request.call_count == 2
+    assert len(httpserver.log) == 2
+    reported = dict(c[0] for c in reporter.metrics.call_args_list)
+    assert reported["http"]["requests"] == 2
+    # the test server closes every connection
+    assert reported["http"]["reused"] == 0
+    assert reported["http"]["request_bytes"] > 2 * len(b'{"foo": "bar"}')
+    assert reported["http_connect"]["min_ms"] >= 0
+
+
+def test_simulate_events_concurrently_report_in_order(httpserver, reporter):
+    specs = []
+    for i in range(6):
+        httpserver.expect_request(f"/users/{i}").respond_with_data(str(i), status=201)
+        specs.append(
+            RequestHttpSpec(
+                execution_mode=ExecutionMode.SIMULATING,
+                assertions={"status_code": 201, "body": str(i).encode()},
+                url=httpserver.url_for(f"/users/{i}"),
+                method="POST",
+                headers={},
+            )
+        )
+    spec = RequestEventsSpec(requests=specs, max_in_flight=3)
+    assert RequestHttpEvents(spec, session=create_session()).execute(reporter)
+
+    bodies = [
+        c[0][0].actual
+        for c in reporter.assertion_passed.call_args_list
+        if isinstance(c[0][0].actual, bytes)
+    ]
+    assert bodies == [b"0", b"1", b"2", b"3", b"4", b"5"]
+    assert len(httpserver.log) == 6
+
+
+def open_model_spec(httpserver, max_in_flight=None):
+    request = RequestHttpSpec(
+        execution_mode=ExecutionMode.SIMULATING,
+        assertions={"status_code": 204},
+        url=httpserver.url_for("/events"),
+        body=b'{"foo": "bar"}',
+        method="POST",
+        headers={},
+    )
+    return RequestEventsSpec(
+        requests=[request], rate_per_sec=50, duration=0.2, max_in_flight=max_in_flight
+    )
+
+
+def test_simulate_open_model_keeps_the_schedule(httpserver, reporter):
+    def slow(request):
+        time.sleep(0.1)
+        return Response(status=204)
+
+    httpserver.expect_request("/events").respond_with_handler(slow)
+    spec = open_model_spec(httpserver, max_in_flight=2)
+    assert RequestHttpEvents(spec, session=create_session()).execute(reporter)
+
+    label, metrics = reporter.metrics.call_args[0]
+    assert label == "open_model"
+    assert metrics["sent"] == 10
+    assert metrics["errors"] == 0
+    # 10 requests of 100ms with 2 in flight take 500ms, the last one
+    # was scheduled at 180ms and waited for a free connection
+    assert metrics["max_ms"] >= 400
+
+
+def test_simulate_open_model_counts_errors(httpserver, reporter):
+    httpserver.expect_request("/events").respond_with_data(status=500)
+    spec = open_model_spec(httpserver)
+    assert not RequestHttpEvents(spec, session=create_session()).execute(reporter)
+
+    metrics = reporter.metrics.call_args[0][1]
+    assert metrics["errors"] == 10
+    assert metrics["error_rate"] == 1.0
+    # the first failed request is reported as an example
+    failures = [c[0][1] for c in reporter.assertion_failed.call_args_list]
+    assert failures == ["http response status_code", "requests with the expected response"]
+
+
+def test_simulate_streams_file_body(httpserver, reporter, tmp_path):
+    path = tmp_path / "large.json"
+    path.write_bytes(b'{"foo": "bar"}')
+    httpserver.expect_request("/users", method="POST", data=b'{"foo": "bar"}').respond_with_data(
+        status=201
+    )
+    spec = RequestHttpSpec(
+        execution_mode=ExecutionMode.SIMULATING,
+        assertions=STATUS_CODE_ASSERTION,
+        url=httpserver.url_for("/users"),
+        body=FileBody(str(path), 14),
+        method="POST",
+        headers={},
+    )
+    assert RequestHttp(spec, session=create_session()).execute(reporter)
+    reported = dict(c[0] for c in reporter.metrics.call_args_list)
+    assert reported["http"]["request_bytes"] > 14
@@ -1,11 +1,14 @@
+import time
+from unittest import mock
 from unittest.mock import MagicMock, call, patch
 
 import pytest
+from werkzeug import Response
 
 from pyrandall.executors import RequestHttp
 from pyrandall.reporter import Reporter
 from pyrandall.spec import RequestHttpSpec
-from pyrandall.types import Assertion, ExecutionMode
+from pyrandall.types import Assertion, ExecutionMode, PollPolicy
 
 
 @pytest.fixture
@@ -166,3 +169,62 @@ def test_validate_body_and_status_do_not_match(assertion, validator_5, reporter_
         )
         in assertion.mock_calls
     )
+
+
+def polling_validator(url, timeout=2.0):
+    spec = RequestHttpSpec(
+        execution_mode=ExecutionMode.VALIDATING,
+        url=url,
+        method="GET",
+        headers={},
+        assertions={"status_code": 200, "body": b'{"count": 2}'},
+        poll=PollPolicy(timeout=timeout, interval=0.01, backoff=2.0, max_interval=0.05),
+    )
+    return RequestHttp(spec)
+
+
+def test_validate_polls_until_data_lands(httpserver, reporter_1):
+    # eventually consistent: not found, stale, then the expected value
+    httpserver.expect_ordered_request("/kv/1").respond_with_data(status=404)
+    httpserver.expect_ordered_request("/kv/1").respond_with_data('{"count": 1}')
+    httpserver.expect_ordered_request("/kv/1").respond_with_data('{"count": 2}')
+
+    assert polling_validator(httpserver.url_for("/kv/1")).execute(reporter_1)
+    assert len(httpserver.log) == 3
+    # only the last attempt is reported
+    assert reporter_1.assertion_passed.call_count == 2
+    reporter_1.assertion_failed.assert_not_called()
+    reporter_1.metrics.assert_called_with("poll", {"attempts": 3, "seconds": mock.ANY})
+
+
+def test_validate_polling_gives_up_after_timeout(httpserver, reporter_1):
+    httpserver.expect_request("/kv/1").respond_with_data('{"count": 1}')
+
+    assert not polling_validator(httpserver.url_for("/kv/1"), timeout=0.2).execute(reporter_1)
+    attempts = reporter_1.metrics.call_args[0][1]["attempts"]
+    assert 3 < attempts < 10
+    reporter_1.assertion_failed.assert_called_once_with(mock.ANY, "http response body")
+
+
+def test_validate_polls_until_the_end_of_the_budget(httpserver, reporter_1):
+    start = time.monotonic()
+
+    def lands_late(request):
+        # the data lands in the last third of the budget
+        if time.monotonic() - start < 0.8:
+            return Response(status=404)
+        return Response('{"count": 2}')
+
+    httpserver.expect_request("/kv/1").respond_with_handler(lands_late)
+    spec = polling_validator(httpserver.url_for("/kv/1"), timeout=1.0).spec._replace(
+        poll=PollPolicy(timeout=1.0, interval=0.5, backoff=1.5, max_interval=5.0, jitter=0.0)
+    )
+    # attempts at 0.0 and 0.5s, the next delay of 0.75s is cut short at 1.0s
+    assert RequestHttp(spec).execute(reporter_1)
+    reporter_1.metrics.assert_called_with("poll", {"attempts": 3, "seconds": mock.ANY})
+
+
+def test_poll_policy_delays_back_off_with_jitter():
+    delays = PollPolicy(timeout=1.0, interval=0.1, backoff=2.0, max_interval=0.5).delays()
+    for expected in [0.1, 0.2, 0.4, 0.5, 0.5]:
+        assert expected * 0.9 <= next(delays) <= expected * 1.1
@@ -1,20 +1,32 @@
 import pytest
 
+from pyrandall.cache import FileCache
 from pyrandall.spec import SpecBuilder
-from pyrandall.types import BrokerKafkaSpec, RequestEventsSpec, RequestHttpSpec
+from pyrandall.types import (
+    BrokerKafkaSpec,
+    FileBody,
+    PollPolicy,
+    RequestEventsSpec,
+    RequestHttpSpec,
+)
 
 
-@pytest.fixture
-def feature():
+def build_feature(path, **kwargs):
     builder = SpecBuilder(
-        specfile=open("examples/scenarios/v2.yaml"),
+        specfile=open(f"examples/scenarios/{path}"),
         dataflow_path="examples/",
         default_request_url="http://localhost:5000",
         schemas_url="http://localhost:8899/schemas/",
+        **kwargs,
     )
     return builder.feature()
 
 
+@pytest.fixture
+def feature():
+    return build_feature("v2.yaml")
+
+
 def test_request_url_missing():
     with pytest.raises(ValueError) as e:
         SpecBuilder(open("examples/scenarios/v2.yaml"), dataflow_path="examples/").feature()
@@ -73,3 +85,99 @@ def test_parse_events_plugins():
         default_request_url="http://localhost:5000",
         schemas_url="http://localhost:8899/schemas/",
     )
+
+
+def test_broker_validate_consume_from(feature):
+    scenario = feature.scenario_items[1]
+    v1, v2 = scenario.validate_tasks
+    assert v1.consume_from == "simulate_start"
+    # defaults to the consumer group
+    assert v2.consume_from == "group"
+
+
+def test_broker_simulate_load_generation():
+    scenario = build_feature("v2_load_kafka.yaml").scenario_items[0]
+    repeated, paced = scenario.simulate_tasks
+    assert repeated.produce_total == 1000
+    assert repeated.rate_per_sec is None
+    assert repeated.assertions == {"events_produced": 1000}
+    assert paced.produce_total == 6000
+    assert paced.rate_per_sec == 200
+    (validate,) = scenario.validate_tasks
+    assert validate.assertions["throughput"] == {"min_events_per_sec": 150, "window": 10.0}
+
+
+def test_broker_validate_unordered_events(feature):
+    v1 = feature.scenario_items[1].validate_tasks[0]
+    assert v1.assertions["total_events"] == 4
+    assert v1.assertions["unordered"] == [b'{ "id": "bar" }\n']
+
+
+def test_result_files_read_once_per_run():
+    v1, v2 = build_feature("v2_ingest_kafka_small.yaml").scenario_items[0].validate_tasks
+    # clicks/3.json is referenced by both validate messages
+    assert v1.assertions["unordered"][2] is v2.assertions["unordered"][0]
+    assert v1.assertions["unordered"][2].parsed == {"click": "three"}
+
+
+def test_request_templates_parsed_once_per_run():
+    cache = FileCache()
+    requests = []
+    for _ in range(2):
+        scenario = build_feature("v2.yaml", file_cache=cache).scenario_items[0]
+        requests.append(scenario.simulate_tasks[0].requests[0])
+    r1, r2 = requests
+    assert r1.body is r2.body
+    assert r1.body == b'{"id": "bar"}'
+    # headers are updated per request, they are not shared
+    assert r1.headers == r2.headers
+    assert r1.headers is not r2.headers
+
+
+def test_large_request_templates_are_streamed():
+    scenario = build_feature("v2.yaml", requests={"stream_body_size": 1}).scenario_items[0]
+    request = scenario.simulate_tasks[0].requests[0]
+    assert request.body == FileBody("examples/events/words1.json", 18)
+    assert request.headers == {"content-type": "application/json"}
+
+
+def test_request_templates_not_streamed_by_default(feature):
+    request = feature.scenario_items[0].simulate_tasks[0].requests[0]
+    assert request.body == b'{"id": "bar"}'
+
+
+def test_broker_validate_ordered_first_and_last_event():
+    scenario = build_feature("v2_kafka_ordered.yaml").scenario_items[0]
+    ordered, first_last, empty = scenario.validate_tasks
+    assert ordered.assertions["ordered"] == [
+        b'{ "click": "one" }\n',
+        b'{\n  "click": "two"\n}\n',
+    ]
+    assert first_last.assertions["first_event"] == b'{ "click": "one" }\n'
+    assert first_last.assertions["latency_under"] == 0.5
+    (simulate,) = scenario.simulate_tasks
+    assert simulate.stamp_correlation_id
+    assert first_last.assertions["last_event"] == b'{\n  "click": "two"\n}\n'
+    assert empty.assertions == {"timeout_after": 2.0, "total_events": 0}
+
+
+def test_broker_validate_matches_subset():
+    (validate,) = build_feature("v2_kafka_subset.yaml").scenario_items[0].validate_tasks
+    file_subset, fields_subset = validate.assertions["matches_subset"]
+    assert file_subset.predicates == [(("click",), "one")]
+    assert fields_subset.predicates == [(("click",), "two"), (("meta", "source"), "pyrandall")]
+
+
+def test_http_simulate_open_model():
+    (simulate,) = build_feature("http/simulate_load.yaml").scenario_items[0].simulate_tasks
+    assert simulate.rate_per_sec == 50
+    assert simulate.duration == 30.0
+    assert len(simulate.requests) == 1
+
+
+def test_http_validate_polling():
+    (validate,) = build_feature("http/validate_polling.yaml").scenario_items[0].validate_tasks
+    assert validate.assertions == {"status_code": 200}
+    assert validate.poll == PollPolicy(
+        timeout=10.0, interval=0.2, backoff=2, max_interval=2.0, jitter=0.2
+    )
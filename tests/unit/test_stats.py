@@ -0,0 +1,24 @@
+from pyrandall.stats import Timings
+
+
+def test_percentiles_nearest_rank():
+    t = Timings()
+    for value in [0.5, 0.1, 0.4, 0.2, 0.3]:
+        t.record(value)
+    assert t.percentile(50) == 0.3
+    assert t.percentile(99) == 0.5
+    assert t.percentile(0) == 0.1
+    assert t.max() == 0.5
+
+
+def test_empty_timings():
+    t = Timings()
+    assert t.percentile(50) is None
+    assert t.mean() is None
+    assert t.summary_ms() == {"p50_ms": None, "p99_ms": None}
+
+
+def test_summary_in_milliseconds():
+    t = Timings()
+    t.record(0.0125)
+    assert t.summary_ms((50,)) == {"p50_ms": 12.5}